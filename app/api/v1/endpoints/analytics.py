@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import json
 from app.api.v1.endpoints.auth import get_current_user
 from app.core import database
+from app.core.config import settings
 from app.models import postgresql as models
+from app.schemas import analytics as schemas
 from app.services.analytics_service import AnalyticsService
+from app.services.analytics_cache import AnalyticsCache
+from app.services.event_logger import event_logger
+from app.services.attachment_cache import AttachmentCache
 
 router = APIRouter()
 
 @router.get("/course/{course_id}/dashboard-full")
 def get_full_dashboard_analytics(
     course_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    days: int = Query(7, ge=1, le=settings.ANALYTICS_MAX_TIMELINE_DAYS),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -24,19 +35,93 @@ def get_full_dashboard_analytics(
     if current_user.role != "teacher" and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only the course teacher can view analytics")
         
-    service = AnalyticsService(db)
-    
-    # Aggregating all data
-    kpis = service.get_quick_kpis(course_id)
-    timeline = service.get_engagement_timeline(course_id, days=7)
-    assignment_stats = service.get_assignment_analytics(course_id)
-    difficulty = service.get_assignment_difficulty(course_id)
-    completion = service.get_course_completion(course_id)
-    
-    return {
-        "kpis": kpis,
-        "engagement_timeline": timeline,
-        "assignment_stats": assignment_stats,
-        "difficulty_indicators": difficulty,
-        "course_completion": completion
-    }
+    # Served from Redis; a stale copy is returned while the refresh runs in the background
+    dashboard, cache_status = AnalyticsCache.get_dashboard(db, course_id, days, background_tasks)
+    response.headers["X-Cache"] = cache_status.upper()
+    return dashboard
+
+@router.get("/course/{course_id}/events")
+async def get_event_analytics(
+    course_id: int,
+    days: int = Query(7, ge=1, le=settings.ANALYTICS_MAX_TIMELINE_DAYS),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Activity, event type breakdown and student engagement from the Cassandra event log.
+    Authorized for the course teacher only.
+    """
+    course = await run_in_threadpool(db.query(models.Course).filter(models.Course.id == course_id).first)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    if course.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the course teacher can view analytics")
+
+    try:
+        return await AnalyticsService(db).get_event_analytics(course_id, days)
+    except Exception as e:
+        print(f"Failed to read event logs from Cassandra: {e}")
+        raise HTTPException(status_code=503, detail="Event analytics unavailable")
+
+@router.get("/cache-stats")
+def get_cache_stats(current_user: models.User = Depends(get_current_user)):
+    """Returns dashboard cache hit/miss counters."""
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view analytics cache statistics")
+    return AnalyticsCache.get_stats()
+
+@router.get("/event-log-stats")
+def get_event_log_stats(current_user: models.User = Depends(get_current_user)):
+    """Returns this process's event logger counters (logged, written, dropped, failed, buffered)."""
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view event log statistics")
+    return event_logger.get_stats()
+
+@router.get("/attachment-cache-stats")
+def get_attachment_cache_stats(current_user: models.User = Depends(get_current_user)):
+    """Returns attachment disk cache counters, hit ratio and current size."""
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view attachment cache statistics")
+    return AttachmentCache.get_stats()
+
+@router.post("/batch")
+def get_batch_analytics(
+    request_in: schemas.BatchAnalyticsRequest,
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Streams KPIs, completion and grade distributions for many courses as NDJSON,
+    one line per course. Only courses taught by the current user are reported.
+    """
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can view analytics")
+    if request_in.course_ids is None and request_in.teacher_id is None:
+        raise HTTPException(status_code=400, detail="Provide course_ids or teacher_id")
+    if request_in.teacher_id is not None and request_in.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view another teacher's courses")
+
+    teacher_id = current_user.id
+    requested_ids = request_in.course_ids
+
+    def generate():
+        # The request-scoped session is gone once streaming starts, so use a dedicated one
+        db = database.SessionLocal()
+        try:
+            service = AnalyticsService(db)
+            owned_ids = service.get_teacher_course_ids(teacher_id)
+            if requested_ids is None:
+                course_ids = owned_ids
+            else:
+                owned = set(owned_ids)
+                course_ids = [cid for cid in dict.fromkeys(requested_ids) if cid in owned]
+                for cid in dict.fromkeys(requested_ids):
+                    if cid not in owned:
+                        yield json.dumps({"course_id": cid, "error": "Course not found or not authorized"}) + "\n"
+
+            for row in service.get_batch_course_analytics(course_ids):
+                yield json.dumps(row) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,23 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Optional
 from jose import jwt, JWTError
 from app.core import auth, database
 from app.core.config import settings
 from app.models import postgresql as models
 from app.schemas import user as schemas
 from app.core.redis_db import redis_client
+from app.services.user_cache import UserCache
+from app.services.session_store import SessionStore
 
 import uuid
 import json
+from datetime import timedelta
 from fastapi.responses import HTMLResponse
 from app.services.email_service import EmailService
 
 router = APIRouter()
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login", auto_error=False)
 
-def get_current_user(db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)) -> models.User:
+def get_request_token(bearer: Optional[str] = Depends(oauth2_scheme)) -> Optional[str]:
+    """
+    The bearer token of an API request. API routes never accept the access_token cookie:
+    browsers attach it to cross-site requests too, which would allow CSRF.
+    """
+    return bearer
+
+def get_cookie_token(access_token: Optional[str] = Cookie(None)) -> Optional[str]:
+    """The access_token cookie set by the login page; only for pages and other GET requests."""
+    return access_token
+
+def get_current_user(db: Session = Depends(database.get_db), token: Optional[str] = Depends(get_request_token)) -> models.User:
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return authenticate_token(db, token)
+
+def get_page_user(db: Session = Depends(database.get_db), token: Optional[str] = Depends(get_cookie_token)) -> Optional[models.User]:
+    """Signed-in user for server-rendered pages (from the cookie)."""
+    if not token:
+        return None
+    try:
+        return authenticate_token(db, token)
+    except HTTPException:
+        return None
+
+def get_page_user_with_courses(
+    db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)
+) -> Optional[models.User]:
+    """get_page_user with course memberships loaded, for the pages that list the user's courses."""
+    if user:
+        load_memberships(db, user)
+    return user
+
+def load_memberships(db: Session, user: models.User) -> models.User:
+    """Loads the user's courses in one query so later accesses don't lazy-load per course."""
+    if user.role == "teacher":
+        courses = db.query(models.Course).filter(models.Course.teacher_id == user.id).all()
+        set_committed_value(user, "courses_created", courses)
+    else:
+        enrollments = db.query(models.CourseEnrollment).options(
+            joinedload(models.CourseEnrollment.course)
+        ).filter(models.CourseEnrollment.user_id == user.id).all()
+        set_committed_value(user, "enrollments", enrollments)
+    return user
+
+def member_courses(user: models.User):
+    """Courses taught (teachers) or joined (students); call load_memberships first."""
+    if user.role == "teacher":
+        return user.courses_created
+    return [enrollment.course for enrollment in user.enrollments]
+
+def decode_token(token: str) -> schemas.TokenPayload:
+    """Validates a JWT and returns its user and session IDs. Raises 401 otherwise."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,19 +87,28 @@ def get_current_user(db: Session = Depends(database.get_db), token: str = Depend
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("sid") is None:
             raise credentials_exception
-        token_data = schemas.TokenPayload(sub=int(user_id))
+        return schemas.TokenPayload(sub=int(user_id), sid=payload["sid"])
     except (JWTError, ValueError):
         raise credentials_exception
+
+def authenticate_token(db: Session, token: str) -> models.User:
+    """Resolves a JWT to its user, checking the Redis session. Raises 401 otherwise."""
+    token_data = decode_token(token)
     
-    # Check if session exists in Redis
-    if not redis_client.get(f"session:{token}"):
+    # Check if session exists in Redis (and fetch the cached user in the same round-trip)
+    valid, cached_user = SessionStore.lookup(token_data.sid, token_data.sub)
+    if not valid:
         raise HTTPException(status_code=401, detail="Session expired or logged out")
-        
+
+    if cached_user:
+        return UserCache.attach(db, cached_user)
+
     user = db.query(models.User).filter(models.User.id == token_data.sub).first()
     if user is None:
-        raise credentials_exception
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    UserCache.store(user)
     return user
 
 @router.post("/register")
@@ -129,7 +199,7 @@ def verify_email(token: str, db: Session = Depends(database.get_db)):
 
     # 3. Create active user
     password = user_data.pop("password")
-    hashed_password = auth.get_password_hash(password)
+    hashed_password = auth.get_password_hash_pooled(password)
     db_user = models.User(**user_data, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
@@ -166,21 +236,49 @@ def verify_email(token: str, db: Session = Depends(database.get_db)):
 @router.post("/login", response_model=schemas.Token)
 def login(db: Session = Depends(database.get_db), form_data: OAuth2PasswordRequestForm = Depends()):
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=400, detail="Incorrect email or password")
+    valid, new_hash = auth.verify_and_update_password_pooled(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
-    access_token = auth.create_access_token(subject=user.id)
+    # Rehash transparently when BCRYPT_ROUNDS has changed since the password was set
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        UserCache.invalidate(user.id)
     
-    # Store session in Redis
-    redis_client.setex(
-        f"session:{access_token}",
-        settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        str(user.id)
+    # Store session in Redis; the token only carries its ID
+    session_id = SessionStore.create(user.id)
+    access_token = auth.create_access_token(
+        subject=user.id,
+        expires_delta=timedelta(hours=settings.SESSION_MAX_AGE_HOURS),
+        session_id=session_id
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-def logout(token: str = Depends(oauth2_scheme)):
-    redis_client.delete(f"session:{token}")
+def logout(token: Optional[str] = Depends(get_request_token)):
+    if not token:
+        return {"message": "Successfully logged out"}
+    try:
+        token_data = decode_token(token)
+    except HTTPException:
+        return {"message": "Successfully logged out"}
+    SessionStore.revoke(token_data.sub, token_data.sid)
     return {"message": "Successfully logged out"}
+
+@router.get("/sessions")
+def list_sessions(token: Optional[str] = Depends(get_request_token), current_user: models.User = Depends(get_current_user)):
+    current_sid = decode_token(token).sid
+    sessions = SessionStore.list(current_user.id)
+    for session in sessions:
+        session["current"] = session["session_id"] == current_sid
+    return sessions
+
+@router.post("/sessions/revoke-all")
+def revoke_all_sessions(current_user: models.User = Depends(get_current_user)):
+    """Signs the user out everywhere, including this session."""
+    revoked = SessionStore.revoke_all(current_user.id)
+    return {"message": "All sessions revoked", "revoked": revoked}
@@ -3,10 +3,12 @@ from sqlalchemy.orm import Session
 from typing import List
 import secrets
 import string
-from app.api.v1.endpoints.auth import get_current_user
-from app.core import database
+from app.api.v1.endpoints.auth import get_current_user, load_memberships, member_courses
+from app.core import database, config
 from app.models import postgresql as models
 from app.schemas import course as schemas
+from app.services.analytics_cache import AnalyticsCache
+from app.services.upload_service import UploadService
 
 router = APIRouter()
 
@@ -42,10 +44,7 @@ def list_courses(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    if current_user.role == "teacher":
-        return db.query(models.Course).filter(models.Course.teacher_id == current_user.id).all()
-    else:
-        return [enrollment.course for enrollment in current_user.enrollments]
+    return member_courses(load_memberships(db, current_user))
 
 @router.post("/join/{code}", response_model=schemas.Course)
 def join_course(
@@ -71,6 +70,7 @@ def join_course(
     enrollment = models.CourseEnrollment(course_id=course.id, user_id=current_user.id)
     db.add(enrollment)
     db.commit()
+    AnalyticsCache.invalidate(course.id)
     return course
 
 @router.get("/{course_id}", response_model=schemas.Course)
@@ -113,8 +113,21 @@ def delete_course(
     if current_user.role != "teacher" or course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this course")
     
+    # Blobs referenced by the course's attachments; they are dropped once nothing else references them
+    post_hashes = [h for (h,) in db.query(models.PostAttachment.content_hash).join(models.Post).filter(
+        models.Post.course_id == course_id
+    ).distinct()]
+    assignment_hashes = [h for (h,) in db.query(models.AssignmentAttachment.content_hash).join(models.Assignment).filter(
+        models.Assignment.course_id == course_id
+    ).distinct()]
+    submission_hashes = [h for (h,) in db.query(models.SubmissionAttachment.content_hash).join(models.Submission).join(
+        models.Assignment
+    ).filter(models.Assignment.course_id == course_id).distinct()]
+
     db.delete(course)
     db.commit()
+    UploadService.release_blobs(db, config.settings.MINIO_BUCKET_ATTACHMENTS, post_hashes + assignment_hashes)
+    UploadService.release_blobs(db, config.settings.MINIO_BUCKET_SUBMISSIONS, submission_hashes)
     return None
 
 @router.post("/{course_id}/unenroll", status_code=status.HTTP_204_NO_CONTENT)
@@ -140,4 +153,5 @@ def unenroll_course(
         
     db.delete(enrollment)
     db.commit()
+    AnalyticsCache.invalidate(course_id)
     return None
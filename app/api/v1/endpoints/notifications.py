@@ -1,16 +1,120 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request, Cookie
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
-from app.api.v1.endpoints.auth import get_current_user
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from app.api.v1.endpoints.auth import get_current_user, authenticate_token, decode_token
 from app.core import database
+from app.core.config import settings
 from app.models import postgresql as models
 from app.services.notification_service import NotificationService
+from app.services.notification_push import notification_broker
+from app.services.session_store import SessionStore
+import asyncio
 
 router = APIRouter()
 
+class MarkReadRequest(BaseModel):
+    ids: List[int] = Field(..., max_length=settings.NOTIFICATION_MARK_READ_MAX_IDS)
+
 @router.get("/unread")
-def get_unread(current_user: models.User = Depends(get_current_user)):
-    return NotificationService.get_unread_notifications(current_user.id)
+def get_unread(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.NOTIFICATION_UNREAD_CACHE_SIZE, ge=1, le=200),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Newest first. X-Next-Cursor, when present, fetches the next (older) page."""
+    notifs, next_cursor = NotificationService.get_unread_notifications(current_user.id, cursor, limit)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return notifs
+
+@router.get("/history")
+def get_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Full notification history, newest first. X-Next-Cursor, when present, fetches the next page."""
+    try:
+        notifs, next_cursor = NotificationService.get_history(current_user.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        print(f"Failed to read notification history from Cassandra: {e}")
+        raise HTTPException(status_code=503, detail="Notification history unavailable")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return notifs
+
+def _authenticate_stream(token: str):
+    """Returns (user ID, session ID) for the stream's token."""
+    # Short-lived session: the stream may stay open for hours and must not pin a connection
+    db = database.SessionLocal()
+    try:
+        return authenticate_token(db, token).id, decode_token(token).sid
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    access_token: Optional[str] = Cookie(None)
+):
+    """
+    Server-Sent Events push of new notifications. Authenticates on connect with the
+    access_token cookie, which EventSource sends automatically. Tokens are not accepted in
+    the query string, where they would end up in access logs. The session is re-checked every
+    keepalive interval, and the stream ends once it is revoked or expires.
+    """
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id, sid = await run_in_threadpool(_authenticate_stream, access_token)
+    loop = asyncio.get_running_loop()
+
+    async def event_stream():
+        queue = await notification_broker.subscribe(user_id)
+        try:
+            unread = await run_in_threadpool(NotificationService.get_unread_count, user_id)
+            yield f"event: unread_count\ndata: {unread}\n\n"
+            next_check = loop.time() + settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS)
+                    yield f"event: notification\ndata: {payload}\n\n"
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                # Also checked while notifications keep arriving, which would skip the timeout
+                if loop.time() >= next_check:
+                    if not await run_in_threadpool(SessionStore.is_active, sid, user_id):
+                        break
+                    next_check = loop.time() + settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS
+        finally:
+            await notification_broker.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/unread/count")
+def get_unread_count(current_user: models.User = Depends(get_current_user)):
+    return {"count": NotificationService.get_unread_count(current_user.id)}
+
+@router.post("/read")
+def mark_many_read(
+    request_in: MarkReadRequest,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    unread = NotificationService.mark_many_as_read(db, current_user.id, request_in.ids)
+    return {"message": "Marked as read", "unread_count": unread}
 
 @router.post("/{notification_id}/read")
 def mark_read(
@@ -26,15 +130,6 @@ def clear_all(
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Mark all unread notifications as read
-    db.query(models.Notification).filter(
-        models.Notification.user_id == current_user.id,
-        models.Notification.is_read == False
-    ).update({"is_read": True})
-    db.commit()
-    
-    # Clear Redis cache
-    from app.core.redis_db import redis_client
-    redis_client.delete(f"user:{current_user.id}:notifications")
-    
+    # Mark all unread notifications as read and clear the Redis cache
+    NotificationService.clear_all(db, current_user.id)
     return {"message": "All notifications cleared"}
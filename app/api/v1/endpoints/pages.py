@@ -1,39 +1,19 @@
-from fastapi import APIRouter, Request, Depends, Cookie, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime
 from app.core import database
 from app.models import postgresql as models
-from app.api.v1.endpoints.auth import get_current_user
-from jose import jwt
-from app.core.config import settings
+from app.api.v1.endpoints.auth import get_page_user, get_page_user_with_courses, member_courses, get_cookie_token, logout
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
-def get_user_from_cookie(db: Session, access_token: Optional[str] = None):
-    if not access_token:
-        return None
-    try:
-        payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id:
-            return db.query(models.User).filter(models.User.id == int(user_id)).first()
-    except:
-        return None
-    return None
-
 @router.get("/")
-async def index_page(request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def index_page(request: Request, user: Optional[models.User] = Depends(get_page_user_with_courses)):
     if user:
-        courses = []
-        if user.role == "teacher":
-            courses = db.query(models.Course).filter(models.Course.teacher_id == user.id).all()
-        else:
-            courses = [en.course for en in user.enrollments]
-        return templates.TemplateResponse("dashboard.html", {"request": request, "user": user, "courses": courses})
+        return templates.TemplateResponse("dashboard.html", {"request": request, "user": user, "courses": member_courses(user)})
     return templates.TemplateResponse("index.html", {"request": request, "user": None})
 
 @router.get("/login")
@@ -45,22 +25,14 @@ async def register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.get("/dashboard")
-async def dashboard_page(request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def dashboard_page(request: Request, user: Optional[models.User] = Depends(get_page_user_with_courses)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
     
-    courses = []
-    if user.role == "teacher":
-        courses = db.query(models.Course).filter(models.Course.teacher_id == user.id).all()
-    else:
-        courses = [en.course for en in user.enrollments]
-        
-    return templates.TemplateResponse("dashboard.html", {"request": request, "user": user, "courses": courses})
+    return templates.TemplateResponse("dashboard.html", {"request": request, "user": user, "courses": member_courses(user)})
 
 @router.get("/courses/{course_id}")
-async def course_stream_page(course_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def course_stream_page(course_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
         
@@ -82,8 +54,7 @@ async def course_stream_page(course_id: int, request: Request, db: Session = Dep
     })
 
 @router.get("/courses/{course_id}/classwork")
-async def classwork_page(course_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def classwork_page(course_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
         
@@ -92,8 +63,7 @@ async def classwork_page(course_id: int, request: Request, db: Session = Depends
     return templates.TemplateResponse("classwork.html", {"request": request, "user": user, "course": course, "assignments": assignments})
 
 @router.get("/courses/{course_id}/assignments/{assignment_id}")
-async def assignment_view_page(course_id: int, assignment_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def assignment_view_page(course_id: int, assignment_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
         
@@ -111,8 +81,7 @@ async def assignment_view_page(course_id: int, assignment_id: int, request: Requ
     })
 
 @router.get("/courses/{course_id}/people")
-async def people_page(course_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def people_page(course_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
     
@@ -136,8 +105,7 @@ async def people_page(course_id: int, request: Request, db: Session = Depends(da
     })
 
 @router.get("/courses/{course_id}/assignments/{assignment_id}/submissions")
-async def submissions_page(course_id: int, assignment_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def submissions_page(course_id: int, assignment_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user or user.role != "teacher":
         return templates.TemplateResponse("login.html", {"request": request})
         
@@ -146,8 +114,7 @@ async def submissions_page(course_id: int, assignment_id: int, request: Request,
     return templates.TemplateResponse("submissions.html", {"request": request, "user": user, "assignment": assignment, "submissions": submissions})
 
 @router.get("/courses/{course_id}/analytics")
-async def course_analytics_page(course_id: int, request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def course_analytics_page(course_id: int, request: Request, db: Session = Depends(database.get_db), user: Optional[models.User] = Depends(get_page_user)):
     if not user or user.role != "teacher":
         return templates.TemplateResponse("login.html", {"request": request})
         
@@ -155,14 +122,14 @@ async def course_analytics_page(course_id: int, request: Request, db: Session =
     return templates.TemplateResponse("analytics.html", {"request": request, "user": user, "course": course})
 
 @router.get("/profile")
-async def profile_page(request: Request, db: Session = Depends(database.get_db), access_token: Optional[str] = Cookie(None)):
-    user = get_user_from_cookie(db, access_token)
+async def profile_page(request: Request, user: Optional[models.User] = Depends(get_page_user)):
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
     return templates.TemplateResponse("profile.html", {"request": request, "user": user})
 
 @router.get("/logout")
-async def logout_page(request: Request):
+async def logout_page(request: Request, token: Optional[str] = Depends(get_cookie_token)):
+    logout(token)
     response = templates.TemplateResponse("login.html", {"request": request})
     response.delete_cookie("access_token")
     return response
@@ -1,55 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import uuid
-import json
-import io
-from datetime import datetime
 from app.api.v1.endpoints.auth import get_current_user
-from app.core import database, cassandra_db, minio_client, config
+from app.core import database, minio_client, config
 from app.models import postgresql as models
 from app.schemas import stream as schemas
+from app.services.analytics_service import AnalyticsService
+from app.services.analytics_cache import AnalyticsCache
+from app.services.notification_queue import NotificationQueue
+from app.services.event_logger import event_logger
+from app.services.upload_service import UploadService
+from app.services.attachment_service import AttachmentService
 
 router = APIRouter()
 
 @router.get("/attachments/{path:path}")
-async def get_attachment(path: str, download: bool = False):
-    try:
-        client = minio_client.get_minio_client()
-        response = client.get_object(config.settings.MINIO_BUCKET_ATTACHMENTS, path)
-        
-        # Extract filename (it's after the uuid_)
-        filename = path.split("/")[-1]
-        if "_" in filename:
-            filename = filename.split("_", 1)[1]
-            
-        disposition = "attachment" if download else "inline"
-        headers = {
-            "Content-Disposition": f'{disposition}; filename="{filename}"'
-        }
-        return StreamingResponse(
-            response, 
-            media_type=response.headers.get('content-type'),
-            headers=headers
-        )
-    except Exception as e:
-        raise HTTPException(status_code=404, detail="Attachment not found")
+async def get_attachment(path: str, request: Request, download: bool = False, db: Session = Depends(database.get_db)):
+    return await AttachmentService.serve(request, db, config.settings.MINIO_BUCKET_ATTACHMENTS, "/api/v1/stream/attachments", path, download)
 
 def log_event(event_type: str, user_id: int, course_id: int, details: dict):
-    try:
-        session = cassandra_db.get_cassandra_session()
-        if not session:
-            return
-        event_id = uuid.uuid4()
-        details_str = json.dumps(details)
-        query = """
-            INSERT INTO event_logs (event_id, event_type, user_id, course_id, details, event_time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        session.execute(query, (event_id, event_type, user_id, course_id, details_str, datetime.utcnow()))
-    except Exception as e:
-        print(f"Failed to log event to Cassandra: {e}")
+    # Buffered; written to Cassandra in the background by the event logger
+    event_logger.log(event_type, user_id, course_id, details)
 
 @router.post("/posts", response_model=schemas.Post)
 async def create_post(
@@ -62,6 +33,7 @@ async def create_post(
 ):
     if not text and not files:
         raise HTTPException(status_code=400, detail="Post must have either text or attachments")
+    UploadService.check_sizes(files)
 
     course = db.query(models.Course).filter(models.Course.id == course_id).first()
     if not course:
@@ -87,50 +59,31 @@ async def create_post(
         type=type
     )
     db.add(db_post)
+    AnalyticsService.record_activity(db, course_id, posts=1)
     db.commit()
     db.refresh(db_post)
 
     if files:
-        for file in files:
-            if not file.filename: continue
-            content = await file.read()
-            file_name = f"posts/{db_post.id}/{uuid.uuid4()}_{file.filename}"
-            bucket = config.settings.MINIO_BUCKET_ATTACHMENTS
-            client = minio_client.get_minio_client()
-            
-            client.put_object(
-                bucket, file_name,
-                data=io.BytesIO(content),
-                length=len(content),
-                content_type=file.content_type
-            )
-            
-            db_attachment = models.PostAttachment(
-                post_id=db_post.id,
-                file_url=f"/api/v1/stream/attachments/{file_name}",
-                filename=file.filename
-            )
-            db.add(db_attachment)
-        
-        db.commit()
+        await UploadService.save_attachments(
+            db, files, config.settings.MINIO_BUCKET_ATTACHMENTS,
+            models.PostAttachment, "/api/v1/stream/attachments", post_id=db_post.id
+        )
         db.refresh(db_post)
 
+    AnalyticsCache.invalidate(course_id)
+
     # Log to Cassandra
     log_event(f"{type}_created", current_user.id, course_id, {"post_id": db_post.id})
     
-    # Notify all students in the course
-    from app.services.notification_service import NotificationService
-    enrollments = db.query(models.CourseEnrollment).filter(models.CourseEnrollment.course_id == course_id).all()
-    for enrollment in enrollments:
-        post_type_label = "announcement" if type == "announcement" else "post"
-        NotificationService.create_notification(
-            db,
-            enrollment.user_id,
-            f"{type}_created",
-            db_post.id,
-            f"New {post_type_label} in {course.title}: {text[:50]}..." if text else f"New {post_type_label} in {course.title}",
-            {"course_id": course_id, "post_id": db_post.id}
-        )
+    # Notify all students in the course (delivered by the notification worker)
+    post_type_label = "announcement" if type == "announcement" else "post"
+    NotificationQueue.enqueue(
+        f"{type}_created",
+        db_post.id,
+        f"New {post_type_label} in {course.title}: {text[:50]}..." if text else f"New {post_type_label} in {course.title}",
+        {"course_id": course_id, "post_id": db_post.id},
+        course_id=course_id
+    )
     
     return db_post
 
@@ -161,9 +114,12 @@ def create_comment(
         text=comment_in.text
     )
     db.add(db_comment)
+    AnalyticsService.record_activity(db, post.course_id, comments=1)
     db.commit()
     db.refresh(db_comment)
     
+    AnalyticsCache.invalidate(post.course_id)
+
     # Log to Cassandra
     log_event("comment_added", current_user.id, post.course_id, {"comment_id": db_comment.id, "post_id": post_id})
     
@@ -185,10 +141,13 @@ def delete_post(
     if not is_author:
         raise HTTPException(status_code=403, detail="Only the author can delete this post")
         
-    # Delete attachments from MinIO
+    # Delete attachments from MinIO; blobs are shared, so they are only dropped once unreferenced
     client = minio_client.get_minio_client()
     bucket = config.settings.MINIO_BUCKET_ATTACHMENTS
+    hashes = [attachment.content_hash for attachment in post.attachments if attachment.content_hash]
     for attachment in post.attachments:
+        if attachment.content_hash:
+            continue
         # file_url is like /api/v1/stream/attachments/posts/58/uuid_filename
         # path is posts/58/uuid_filename
         path = attachment.file_url.split("/attachments/")[-1]
@@ -197,8 +156,11 @@ def delete_post(
         except Exception as e:
             print(f"Failed to delete MinIO object {path}: {e}")
             
+    AnalyticsService.record_post_deleted(db, post)
     db.delete(post)
     db.commit()
+    UploadService.release_blobs(db, bucket, hashes)
+    AnalyticsCache.invalidate(course.id)
     
     log_event("post_deleted", current_user.id, course.id, {"post_id": post_id})
     return {"message": "Post deleted successfully"}
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api.v1.endpoints.auth import get_current_user
+from app.api.v1.endpoints.assignments import check_submission_open
+from app.core import database, minio_client, config
+from app.models import postgresql as models
+from app.schemas import upload as schemas
+from app.services.upload_service import UploadService, MB
+from app.services.analytics_cache import AnalyticsCache
+
+router = APIRouter()
+
+# kind -> (bucket, attachment model, parent column, object prefix, serving URL prefix)
+ATTACHMENT_KINDS = {
+    "post": (config.settings.MINIO_BUCKET_ATTACHMENTS, models.PostAttachment, "post_id", "posts", "/api/v1/stream/attachments"),
+    "assignment": (config.settings.MINIO_BUCKET_ATTACHMENTS, models.AssignmentAttachment, "assignment_id", "assignments", "/api/v1/stream/attachments"),
+    "submission": (config.settings.MINIO_BUCKET_SUBMISSIONS, models.SubmissionAttachment, "submission_id", "submissions", "/api/v1/assignments/attachments")
+}
+
+def _check_parent(db: Session, kind: str, parent_id: int, user: models.User) -> int:
+    """
+    Only the author of a post, the teacher of an assignment or the student of a submission
+    that is still open (see check_submission_open) may attach files. Returns the course ID.
+    """
+    if kind == "post":
+        post = db.query(models.Post).filter(models.Post.id == parent_id).first()
+        if post is not None and post.user_id == user.id:
+            return post.course_id
+    elif kind == "assignment":
+        assignment = db.query(models.Assignment).filter(models.Assignment.id == parent_id).first()
+        if assignment is not None and assignment.course.teacher_id == user.id:
+            return assignment.course_id
+    else:
+        submission = db.query(models.Submission).filter(models.Submission.id == parent_id).first()
+        if submission is not None and submission.student_id == user.id:
+            check_submission_open(submission.assignment, submission)
+            return submission.assignment.course_id
+    raise HTTPException(status_code=403, detail="Not authorized to attach files here")
+
+@router.post("/presign", response_model=schemas.PresignUploadResponse)
+def presign_upload(
+    request_in: schemas.PresignUploadRequest,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Issues a short-lived URL to PUT one file straight to MinIO. Once uploaded, call
+    /finalize with the returned object_name to attach it.
+    """
+    if not config.settings.STORAGE_PRESIGNED:
+        raise HTTPException(status_code=404, detail="Direct uploads are not enabled")
+    if request_in.size > config.settings.UPLOAD_MAX_FILE_MB * MB:
+        raise HTTPException(status_code=413, detail=f"{request_in.filename} exceeds the {config.settings.UPLOAD_MAX_FILE_MB} MB upload limit")
+    _check_parent(db, request_in.kind, request_in.parent_id, current_user)
+
+    bucket, _, _, prefix, _ = ATTACHMENT_KINDS[request_in.kind]
+    object_name = UploadService.object_name(f"{prefix}/{request_in.parent_id}", request_in.filename)
+    return {
+        "upload_url": UploadService.presign_put(bucket, object_name),
+        "object_name": object_name,
+        "expires_in": config.settings.PRESIGNED_URL_EXPIRE_SECONDS
+    }
+
+@router.post("/finalize", response_model=schemas.Attachment)
+def finalize_upload(
+    request_in: schemas.FinalizeUploadRequest,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Registers a file uploaded through a presigned URL as an attachment. Safe to retry."""
+    if not config.settings.STORAGE_PRESIGNED:
+        raise HTTPException(status_code=404, detail="Direct uploads are not enabled")
+    course_id = _check_parent(db, request_in.kind, request_in.parent_id, current_user)
+
+    bucket, model, parent_column, prefix, url_prefix = ATTACHMENT_KINDS[request_in.kind]
+    if not request_in.object_name.startswith(f"{prefix}/{request_in.parent_id}/") or ".." in request_in.object_name:
+        raise HTTPException(status_code=400, detail="Object does not belong to this item")
+
+    file_url = f"{url_prefix}/{request_in.object_name}"
+    existing = db.query(model).filter(model.file_url == file_url).first()
+    if existing:
+        return existing
+
+    client = minio_client.get_minio_client()
+    try:
+        stat = client.stat_object(bucket, request_in.object_name)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if stat.size > config.settings.UPLOAD_MAX_FILE_MB * MB:
+        # The presigned PUT cannot cap the size, so oversized objects are dropped here
+        try:
+            client.remove_object(bucket, request_in.object_name)
+        except Exception as e:
+            print(f"Failed to delete MinIO object {request_in.object_name}: {e}")
+        raise HTTPException(status_code=413, detail=f"{request_in.filename} exceeds the {config.settings.UPLOAD_MAX_FILE_MB} MB upload limit")
+
+    db_attachment = model(
+        file_url=file_url,
+        filename=request_in.filename,
+        **{parent_column: request_in.parent_id}
+    )
+    db.add(db_attachment)
+    db.commit()
+    db.refresh(db_attachment)
+    AnalyticsCache.invalidate(course_id)
+    return db_attachment
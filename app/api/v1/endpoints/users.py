@@ -2,12 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import Optional
 import uuid
-import io
-from app.api.v1.endpoints.auth import get_current_user
-from app.core.auth import get_password_hash
-from app.core import database, minio_client, config
+from app.api.v1.endpoints.auth import get_current_user, decode_token, get_request_token
+from app.core.auth import verify_password_pooled, get_password_hash_pooled
+from app.core import database, config
 from app.models import postgresql as models
 from app.schemas import user as schemas
+from app.services.user_cache import UserCache
+from app.services.session_store import SessionStore
+from app.services.upload_service import UploadService
 
 router = APIRouter()
 
@@ -21,6 +23,7 @@ def update_profile(
         current_user.name = name
     
     db.commit()
+    UserCache.invalidate(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -28,22 +31,25 @@ def update_profile(
 def update_password(
     password_data: dict,
     db: Session = Depends(database.get_db),
+    token: str = Depends(get_request_token),
     current_user: models.User = Depends(get_current_user)
 ):
-    from passlib.context import CryptContext
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    
     current_password = password_data.get("current_password")
     new_password = password_data.get("new_password")
     
     if not current_password or not new_password:
         raise HTTPException(status_code=400, detail="Both current and new password are required")
     
-    if not pwd_context.verify(current_password, current_user.hashed_password):
+    # The cached user carries no credentials, so the hash is read from PostgreSQL
+    hashed_password = db.query(models.User.hashed_password).filter(models.User.id == current_user.id).scalar()
+    if not verify_password_pooled(current_password, hashed_password):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = get_password_hash_pooled(new_password)
     db.commit()
+    UserCache.invalidate(current_user.id)
+    # Sign out every other device; this session stays valid
+    SessionStore.revoke_all(current_user.id, except_sid=decode_token(token).sid)
     
     return {"message": "Password updated successfully"}
 
@@ -56,20 +62,13 @@ async def update_profile_picture(
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    content = await file.read()
     file_name = f"profile_pictures/{current_user.id}/{uuid.uuid4()}_{file.filename}"
     bucket = config.settings.MINIO_BUCKET_ATTACHMENTS
-    client = minio_client.get_minio_client()
-    
-    client.put_object(
-        bucket, file_name,
-        data=io.BytesIO(content),
-        length=len(content),
-        content_type=file.content_type
-    )
+    await UploadService.upload(file, bucket, file_name, max_bytes=config.settings.UPLOAD_MAX_IMAGE_MB * 1024 * 1024)
     
     current_user.profile_picture_url = f"/api/v1/stream/attachments/{file_name}"
     db.commit()
+    UserCache.invalidate(current_user.id)
     db.refresh(current_user)
     
     return current_user
@@ -2,9 +2,23 @@ from datetime import datetime, timedelta
 from typing import Optional, Any, Union
 from jose import jwt
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
 from .config import settings
+import multiprocessing
+import os
+import threading
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max equal to the default make needs_update() flag hashes made with any other cost
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+_password_pool = None
+_password_pool_lock = threading.Lock()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -12,11 +26,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _get_password_pool() -> ProcessPoolExecutor:
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            # bcrypt is CPU-bound, so it runs in separate processes instead of blocking a worker.
+            # Spawned rather than forked: the API process has threads and open connections.
+            _password_pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _password_pool
+
+def shutdown_password_pool():
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is not None:
+            _password_pool.shutdown(cancel_futures=True)
+            _password_pool = None
+
+# Called from sync endpoints (run in the threadpool); the calling thread waits on the pool
+def verify_password_pooled(plain_password: str, hashed_password: str) -> bool:
+    return _get_password_pool().submit(verify_password, plain_password, hashed_password).result()
+
+def get_password_hash_pooled(password: str) -> str:
+    return _get_password_pool().submit(get_password_hash, password).result()
+
+def verify_and_update_password_pooled(plain_password: str, hashed_password: str):
+    return _get_password_pool().submit(verify_and_update_password, plain_password, hashed_password).result()
+
+def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None, session_id: Optional[str] = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": str(subject)}
+    if session_id:
+        to_encode["sid"] = session_id
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
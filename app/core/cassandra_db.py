@@ -1,29 +1,79 @@
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
 from .config import settings
+import asyncio
 import logging
+import threading
+import time
+
+# Every statement the app runs, prepared once per connection (see CassandraClient.prepare_statements)
+STATEMENTS = {
+    "insert_event": """
+        INSERT INTO event_logs_by_day (course_id, day, event_time, event_id, event_type, user_id, details)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "select_events": """
+        SELECT course_id, event_time, event_id, event_type, user_id, details
+        FROM event_logs_by_day WHERE course_id = ? AND day = ? AND event_time >= ? AND event_time < ?
+    """,
+    "insert_notification_history": """
+        INSERT INTO notification_history_by_month (user_id, month, created_at, notification_id, type, reference_id, message, is_read)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "select_notification_history": """
+        SELECT notification_id, type, reference_id, message, created_at
+        FROM notification_history_by_month WHERE user_id = ? AND month = ?
+    """
+}
 
 class CassandraClient:
     def __init__(self):
         self.cluster = None
         self.session = None
+        self.statements = {}
+        self.lock = threading.Lock()
+        self.failed_at = None
 
     def connect(self):
-        self.cluster = Cluster([settings.CASSANDRA_HOST], port=settings.CASSANDRA_PORT)
-        self.session = self.cluster.connect()
-        self.create_keyspace()
-        self.session.set_keyspace(settings.CASSANDRA_KEYSPACE)
-        self.create_tables()
-
-    def create_keyspace(self):
-        self.session.execute(f"""
+        """
+        Connects and prepares statements. A failed attempt is remembered: for the next
+        CASSANDRA_RECONNECT_SECONDS callers fail immediately instead of building a new Cluster.
+        """
+        with self.lock:
+            if self.session:
+                return
+            if self.failed_at is not None and time.monotonic() - self.failed_at < settings.CASSANDRA_RECONNECT_SECONDS:
+                raise ConnectionError("Cassandra is unavailable; not retrying yet")
+            cluster = None
+            try:
+                cluster = Cluster([settings.CASSANDRA_HOST], port=settings.CASSANDRA_PORT)
+                session = cluster.connect()
+                self.create_keyspace(session)
+                session.set_keyspace(settings.CASSANDRA_KEYSPACE)
+                self.create_tables(session)
+                statements = self._prepare(session)
+            except Exception:
+                self.failed_at = time.monotonic()
+                if cluster:
+                    cluster.shutdown()
+                raise
+            # get_cassandra_session reads these without the lock, so they are published only once
+            # the session is fully set up, statements first
+            self.cluster = cluster
+            self.statements = statements
+            self.session = session
+            self.failed_at = None
+
+    def create_keyspace(self, session=None):
+        (session or self.session).execute(f"""
             CREATE KEYSPACE IF NOT EXISTS {settings.CASSANDRA_KEYSPACE}
             WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': '1'}}
         """)
 
-    def create_tables(self):
-        # Event logs for analytics
-        self.session.execute(f"""
+    def create_tables(self, session=None):
+        session = session or self.session
+        # Event logs partitioned by course alone (legacy; only read by migrate_event_logs.py)
+        session.execute(f"""
             CREATE TABLE IF NOT EXISTS event_logs (
                 event_id uuid,
                 event_type text,
@@ -35,8 +85,22 @@ class CassandraClient:
             ) WITH CLUSTERING ORDER BY (event_time DESC, event_id ASC);
         """)
 
+        # Event logs for analytics, bucketed by UTC day ("YYYY-MM-DD") so no partition grows unbounded
+        session.execute(f"""
+            CREATE TABLE IF NOT EXISTS event_logs_by_day (
+                course_id int,
+                day text,
+                event_time timestamp,
+                event_id uuid,
+                event_type text,
+                user_id int,
+                details text,
+                PRIMARY KEY ((course_id, day), event_time, event_id)
+            ) WITH CLUSTERING ORDER BY (event_time DESC, event_id ASC);
+        """)
+
         # Notification history
-        self.session.execute(f"""
+        session.execute(f"""
             CREATE TABLE IF NOT EXISTS notification_history (
                 user_id int,
                 notification_id uuid,
@@ -49,6 +113,27 @@ class CassandraClient:
             ) WITH CLUSTERING ORDER BY (created_at DESC, notification_id ASC);
         """)
 
+        # Notification history bucketed by month ("YYYY-MM") so partitions stay bounded
+        session.execute(f"""
+            CREATE TABLE IF NOT EXISTS notification_history_by_month (
+                user_id int,
+                month text,
+                created_at timestamp,
+                notification_id uuid,
+                type text,
+                reference_id int,
+                message text,
+                is_read boolean,
+                PRIMARY KEY ((user_id, month), created_at, notification_id)
+            ) WITH CLUSTERING ORDER BY (created_at DESC, notification_id ASC);
+        """)
+
+    def prepare_statements(self):
+        self.statements = self._prepare(self.session)
+
+    def _prepare(self, session):
+        return {name: session.prepare(query) for name, query in STATEMENTS.items()}
+
     def close(self):
         if self.cluster:
             self.cluster.shutdown()
@@ -59,3 +144,31 @@ def get_cassandra_session():
     if not cassandra_client.session:
         cassandra_client.connect()
     return cassandra_client.session
+
+def get_statement(name: str):
+    """Returns the prepared statement registered under name, connecting first if needed."""
+    get_cassandra_session()
+    return cassandra_client.statements[name]
+
+def execute_async(session, statement, parameters=None):
+    """
+    Runs statement with the driver's execute_async and returns an asyncio future resolving to
+    all result rows (every page is fetched). Must be called from a running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    rows = []
+    response = session.execute_async(statement, parameters)
+
+    def on_page(page):
+        rows.extend(page or [])
+        if response.has_more_pages:
+            response.start_fetching_next_page()
+        else:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(rows))
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(lambda: future.done() or future.set_exception(exc))
+
+    response.add_callbacks(on_page, on_error)
+    return future
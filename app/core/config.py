@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     CASSANDRA_HOST: str
     CASSANDRA_PORT: int
     CASSANDRA_KEYSPACE: str
+    CASSANDRA_RECONNECT_SECONDS: int = 30 # after a failed connect, fail fast for this long before trying again
     
     # MinIO
     MINIO_ROOT_USER: str
@@ -30,11 +31,58 @@ class Settings(BaseSettings):
     MINIO_ENDPOINT: str
     MINIO_BUCKET_ATTACHMENTS: str
     MINIO_BUCKET_SUBMISSIONS: str
+    MINIO_PUBLIC_ENDPOINT: str = "" # endpoint browsers use for presigned URLs (default: MINIO_ENDPOINT)
+    MINIO_REGION: str = "us-east-1"
+    STORAGE_PRESIGNED: bool = False # redirect downloads / allow uploads straight to MinIO via presigned URLs
+    PRESIGNED_URL_EXPIRE_SECONDS: int = 300
+    UPLOAD_PART_SIZE_MB: int = 5 # multipart part size, roughly the memory held per upload (MinIO minimum is 5)
+    UPLOAD_MAX_FILE_MB: int = 500
+    UPLOAD_MAX_IMAGE_MB: int = 10 # profile pictures
+    UPLOAD_MAX_REQUEST_MB: int = 2048 # whole multipart request, checked before the body is read
+    UPLOAD_WORKERS: int = 8 # concurrent MinIO uploads per process
+    ATTACHMENT_CACHE_DIR: str = "/tmp/attachment-cache" # shared by all workers on the host; created 0700, must be owned by the app user
+    ATTACHMENT_CACHE_MAX_MB: int = 2048 # 0 disables the disk cache
+    ATTACHMENT_CACHE_MAX_OBJECT_MB: int = 50 # larger objects are always streamed from MinIO
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 # session idle timeout
+    SESSION_MAX_AGE_HOURS: int = 24 # absolute session lifetime (JWT expiry)
+    SESSION_REFRESH_SECONDS: int = 300 # minimum interval between sliding-expiry writes
+    BCRYPT_ROUNDS: int = 12 # existing hashes are upgraded to this cost on login
+    PASSWORD_HASH_WORKERS: int = 0 # processes for bcrypt; 0 = one per CPU
+    USER_CACHE_TTL_SECONDS: int = 300 # serialized users in Redis
+    USER_CACHE_LOCAL_SIZE: int = 1024 # users kept in each process
+    USER_CACHE_LOCAL_TTL_SECONDS: int = 60
+    
+    # Analytics
+    ANALYTICS_MAX_TIMELINE_DAYS: int = 366
+    ANALYTICS_DASHBOARD_WORKERS: int = 8 # threads (and pooled DB connections) shared by dashboard sections
+    ANALYTICS_CACHE_TTL_SECONDS: int = 300 # fresh window for an unchanged course
+    ANALYTICS_CACHE_STALE_TTL_SECONDS: int = 86400 # how long a stale copy may be served while refreshing
+    ANALYTICS_CACHE_REFRESH_LOCK_SECONDS: int = 60
+    
+    # Notifications
+    NOTIFICATION_QUEUE_MODE: str = "redis" # "redis" (stream + workers) or "local" (in-process thread)
+    NOTIFICATION_WORKER_EMBEDDED: bool = True # run a stream consumer inside each API process
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_IDLE_MS: int = 30000
+    NOTIFICATION_STREAM_MAXLEN: int = 100000
+    NOTIFICATION_UNREAD_CACHE_SIZE: int = 50 # unread notifications kept in Redis per user
+    NOTIFICATION_MARK_READ_MAX_IDS: int = 500 # per POST /notifications/read; the IDs go to one Lua call
+    NOTIFICATION_STREAM_QUEUE_SIZE: int = 20 # events buffered per open stream
+    NOTIFICATION_STREAM_KEEPALIVE_SECONDS: int = 20
+    NOTIFICATION_HISTORY_MONTHS: int = 12 # how far back the history API walks month buckets
+    
+    # Event logging (Cassandra)
+    EVENT_LOG_BUFFER_SIZE: int = 10000 # events held in memory; the oldest are dropped beyond this
+    EVENT_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENT_LOG_FLUSH_THRESHOLD: int = 500 # buffered events that trigger an early flush
+    EVENT_LOG_FLUSH_MAX_EVENTS: int = 2000 # events taken per flush round
+    EVENT_LOG_BATCH_SIZE: int = 50 # statements per unlogged batch
+    EVENT_LOG_MAX_BACKOFF_SECONDS: float = 60.0 # longest pause between flushes while Cassandra keeps failing
+    EVENT_LOG_READ_CONCURRENCY: int = 16 # day partitions read in parallel
     
     # Email (SMTP)
     MAIL_USERNAME: str = "apikey" # Default for SendGrid etc, or blank
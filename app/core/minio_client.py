@@ -8,6 +8,17 @@ minio_client = Minio(
     secure=False
 )
 
+# Only signs URLs (no requests are made, hence the fixed region); the signature covers the
+# host, so it must use the endpoint browsers will reach.
+_public_endpoint = settings.MINIO_PUBLIC_ENDPOINT or settings.MINIO_ENDPOINT
+presign_client = Minio(
+    _public_endpoint.replace("http://", "").replace("https://", ""),
+    access_key=settings.MINIO_ROOT_USER,
+    secret_key=settings.MINIO_ROOT_PASSWORD,
+    secure=_public_endpoint.startswith("https://"),
+    region=settings.MINIO_REGION
+)
+
 def init_minio():
     buckets = [settings.MINIO_BUCKET_ATTACHMENTS, settings.MINIO_BUCKET_SUBMISSIONS]
     for bucket in buckets:
@@ -16,3 +27,6 @@ def init_minio():
 
 def get_minio_client():
     return minio_client
+
+def get_presign_client():
+    return presign_client
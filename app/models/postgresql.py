@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, JSON, Enum as SQLEnum, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Boolean, JSON, Enum as SQLEnum, CheckConstraint, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 import enum
@@ -111,8 +111,9 @@ class AssignmentAttachment(Base):
     __tablename__ = "assignment_attachments"
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
-    file_url = Column(String, nullable=False)
+    file_url = Column(String, nullable=False, index=True)
     filename = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True) # SHA-256 of the blob (salted per student for submissions); NULL for per-upload objects
     
     assignment = relationship("Assignment", back_populates="attachments")
 
@@ -120,8 +121,9 @@ class PostAttachment(Base):
     __tablename__ = "post_attachments"
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
-    file_url = Column(String, nullable=False)
+    file_url = Column(String, nullable=False, index=True)
     filename = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True) # SHA-256 of the blob (salted per student for submissions); NULL for per-upload objects
     
     post = relationship("Post", back_populates="attachments")
 
@@ -148,8 +150,9 @@ class SubmissionAttachment(Base):
     __tablename__ = "submission_attachments"
     id = Column(Integer, primary_key=True, index=True)
     submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
-    file_url = Column(String, nullable=False)
+    file_url = Column(String, nullable=False, index=True)
     filename = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True) # SHA-256 of the blob (salted per student for submissions); NULL for per-upload objects
     
     submission = relationship("Submission", back_populates="attachments")
 
@@ -162,5 +165,20 @@ class Notification(Base):
     reference_id = Column(Integer, nullable=True)
     is_read = Column(Boolean, default=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    idempotency_key = Column(String, nullable=True) # fan-out job that created it; makes retries safe
     
     user = relationship("User", back_populates="notifications")
+
+    __table_args__ = (
+        UniqueConstraint('idempotency_key', 'user_id', name='unique_notification_per_job'),
+    )
+
+# Analytics rollup: per-course, per-day counters incremented by the write endpoints
+class CourseDailyActivity(Base):
+    __tablename__ = "course_daily_activity"
+
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    posts = Column(Integer, nullable=False, default=0, server_default="0")
+    comments = Column(Integer, nullable=False, default=0, server_default="0")
+    submissions = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+class BatchAnalyticsRequest(BaseModel):
+    course_ids: Optional[List[int]] = None
+    teacher_id: Optional[int] = None # all courses taught by this teacher
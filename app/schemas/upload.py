@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Literal
+
+AttachmentKind = Literal["post", "assignment", "submission"]
+
+class PresignUploadRequest(BaseModel):
+    kind: AttachmentKind
+    parent_id: int # post, assignment or submission ID
+    filename: str
+    size: int
+
+class PresignUploadResponse(BaseModel):
+    upload_url: str
+    object_name: str
+    expires_in: int
+
+class FinalizeUploadRequest(BaseModel):
+    kind: AttachmentKind
+    parent_id: int
+    object_name: str
+    filename: str
+
+class Attachment(BaseModel):
+    id: int
+    file_url: str
+    filename: str
@@ -29,3 +29,4 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Optional[int] = None
+    sid: Optional[str] = None
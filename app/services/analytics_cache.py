@@ -0,0 +1,103 @@
+from sqlalchemy.orm import Session
+from app.core.redis_db import redis_client
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.analytics_service import AnalyticsService
+import json
+import time
+
+STATS_KEY = "analytics:cache:stats"
+
+class AnalyticsCache:
+    """
+    Redis cache for the assembled course dashboard. Writes that affect a course bump
+    its version, so entries are keyed by version and never deleted; the latest entry
+    is also kept under a stale key and served while a background task recomputes.
+    """
+
+    @staticmethod
+    def _version_key(course_id: int):
+        return f"analytics:course:{course_id}:version"
+
+    @staticmethod
+    def _entry_key(course_id: int, version: int, days: int):
+        return f"analytics:course:{course_id}:dashboard:v{version}:d{days}"
+
+    @staticmethod
+    def _stale_key(course_id: int, days: int):
+        return f"analytics:course:{course_id}:dashboard:stale:d{days}"
+
+    @staticmethod
+    def _lock_key(course_id: int, days: int):
+        return f"analytics:course:{course_id}:dashboard:refreshing:d{days}"
+
+    @staticmethod
+    def invalidate(course_id: int):
+        """Marks every cached dashboard of the course as outdated."""
+        redis_client.incr(AnalyticsCache._version_key(course_id))
+
+    @staticmethod
+    def get_dashboard(db: Session, course_id: int, days: int, background_tasks=None):
+        """
+        Returns (dashboard, cache_status) where cache_status is "hit", "stale" or "miss".
+        A stale copy is only served when a refresh can be scheduled on background_tasks.
+        """
+        version = int(redis_client.get(AnalyticsCache._version_key(course_id)) or 0)
+
+        pipe = redis_client.pipeline()
+        pipe.get(AnalyticsCache._entry_key(course_id, version, days))
+        pipe.get(AnalyticsCache._stale_key(course_id, days))
+        current, stale = pipe.execute()
+
+        if current:
+            redis_client.hincrby(STATS_KEY, "hits", 1)
+            return json.loads(current)["data"], "hit"
+
+        if stale and background_tasks is not None:
+            # Only one worker recomputes; everyone else keeps serving the stale copy
+            lock_acquired = redis_client.set(
+                AnalyticsCache._lock_key(course_id, days), "1",
+                nx=True, ex=settings.ANALYTICS_CACHE_REFRESH_LOCK_SECONDS
+            )
+            if lock_acquired:
+                background_tasks.add_task(AnalyticsCache.refresh, course_id, days, version)
+            redis_client.hincrby(STATS_KEY, "stale_hits", 1)
+            return json.loads(stale)["data"], "stale"
+
+        redis_client.hincrby(STATS_KEY, "misses", 1)
+        data = AnalyticsService(db).get_full_dashboard(course_id, days)
+        AnalyticsCache.store(course_id, days, version, data)
+        return data, "miss"
+
+    @staticmethod
+    def refresh(course_id: int, days: int, version: int):
+        """Recomputes the dashboard for the given version (runs as a background task)."""
+        db = SessionLocal()
+        try:
+            data = AnalyticsService(db).get_full_dashboard(course_id, days)
+            AnalyticsCache.store(course_id, days, version, data)
+            redis_client.hincrby(STATS_KEY, "refreshes", 1)
+        except Exception as e:
+            print(f"Failed to refresh analytics dashboard for course {course_id}: {e}")
+        finally:
+            db.close()
+            redis_client.delete(AnalyticsCache._lock_key(course_id, days))
+
+    @staticmethod
+    def store(course_id: int, days: int, version: int, data: dict):
+        # The version was read before computing, so a write that lands meanwhile
+        # bumps the version and this entry is simply never read as current.
+        payload = json.dumps({"version": version, "computed_at": time.time(), "data": data})
+        pipe = redis_client.pipeline()
+        pipe.setex(AnalyticsCache._entry_key(course_id, version, days), settings.ANALYTICS_CACHE_TTL_SECONDS, payload)
+        pipe.setex(AnalyticsCache._stale_key(course_id, days), settings.ANALYTICS_CACHE_STALE_TTL_SECONDS, payload)
+        pipe.execute()
+
+    @staticmethod
+    def get_stats():
+        stats = {k: int(v) for k, v in redis_client.hgetall(STATS_KEY).items()}
+        for counter in ("hits", "stale_hits", "misses", "refreshes"):
+            stats.setdefault(counter, 0)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
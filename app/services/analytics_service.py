@@ -1,157 +1,486 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, distinct, select, cast, literal, union_all, Date
+from sqlalchemy.dialects.postgresql import insert
 from app.models import postgresql as models
 from app.core import cassandra_db
-from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.event_log_reader import EventLogReader
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
+import asyncio
+
+DASHBOARD_SECTIONS = ("kpis", "engagement_timeline", "assignment_stats", "difficulty_indicators", "course_completion")
+
+_dashboard_executor = ThreadPoolExecutor(
+    max_workers=settings.ANALYTICS_DASHBOARD_WORKERS,
+    thread_name_prefix="analytics-dashboard"
+)
+
+BATCH_CHUNK_SIZE = 500
+GRADEBOOK_BATCH_SIZE = 2000
+GRADE_BUCKETS = ("A", "B", "C", "D", "F")
+
+# Points per event when scoring student engagement from the event log
+ENGAGEMENT_WEIGHTS = {
+    "assignment_submitted": 5,
+    "post_created": 3,
+    "announcement_created": 3,
+    "comment_added": 1
+}
+
+def _is_late():
+    return models.Submission.timestamp > models.Assignment.due_date
+
+def _grade_bucket_counts():
+    """COUNT ... FILTER columns binning Submission.grade into A-F, labelled by bucket."""
+    grade = models.Submission.grade
+    return [
+        func.count(grade).filter(grade >= 90).label("A"),
+        func.count(grade).filter(grade >= 80, grade < 90).label("B"),
+        func.count(grade).filter(grade >= 70, grade < 80).label("C"),
+        func.count(grade).filter(grade >= 60, grade < 70).label("D"),
+        func.count(grade).filter(grade < 60).label("F")
+    ]
 
 class AnalyticsService:
     def __init__(self, db: Session):
         self.db = db
-        self.cassandra_session = cassandra_db.get_cassandra_session()
 
-    def get_quick_kpis(self, course_id: int):
-        """Returns summarized KPIs for the course."""
-        total_students = self.db.query(models.CourseEnrollment).filter_by(course_id=course_id).count()
-        total_assignments = self.db.query(models.Assignment).filter_by(course_id=course_id).count()
-        
-        upcoming_deadlines = self.db.query(models.Assignment).filter(
+    @property
+    def cassandra_session(self):
+        # Connected on first use so PostgreSQL-only sections don't depend on Cassandra
+        return cassandra_db.get_cassandra_session()
+
+    def get_course_counts(self, course_id: int):
+        """Returns the enrollment, assignment and submission counts shared by several sections, in one query."""
+        enrolled = self.db.query(func.count(models.CourseEnrollment.user_id)).filter(
+            models.CourseEnrollment.course_id == course_id
+        ).scalar_subquery()
+        assignments = self.db.query(func.count(models.Assignment.id)).filter(
+            models.Assignment.course_id == course_id
+        ).scalar_subquery()
+        upcoming = self.db.query(func.count(models.Assignment.id)).filter(
             models.Assignment.course_id == course_id,
             models.Assignment.due_date >= datetime.utcnow()
-        ).count()
+        ).scalar_subquery()
+        submissions = self.db.query(func.count(models.Submission.id)).join(models.Assignment).filter(
+            models.Assignment.course_id == course_id
+        ).scalar_subquery()
+
+        row = self.db.query(
+            enrolled.label("enrolled"),
+            assignments.label("assignments"),
+            upcoming.label("upcoming"),
+            submissions.label("submissions")
+        ).one()
+        return row._asdict()
 
+    def get_quick_kpis(self, course_id: int, counts: dict = None):
+        """Returns summarized KPIs for the course."""
+        counts = counts or self.get_course_counts(course_id)
         return {
-            "total_students": total_students,
-            "total_assignments": total_assignments,
-            "upcoming_deadlines": upcoming_deadlines
+            "total_students": counts["enrolled"],
+            "total_assignments": counts["assignments"],
+            "upcoming_deadlines": counts["upcoming"]
         }
 
     def get_engagement_timeline(self, course_id: int, days: int = 7):
-        """Returns daily activity counts from PostgreSQL to ensure consistency with status charts."""
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # 1. Posts
-        posts = self.db.query(models.Post.timestamp).filter(
-            models.Post.course_id == course_id, 
-            models.Post.timestamp >= start_date
-        ).all()
+        """Returns daily activity counts from the course_daily_activity rollup (one row per active day)."""
+        days = max(1, min(days, settings.ANALYTICS_MAX_TIMELINE_DAYS))
+        today = datetime.utcnow().date()
+        start_day = today - timedelta(days=days - 1)
 
-        # 2. Submissions (Join Assignment to filter by course)
-        submissions = self.db.query(models.Submission.timestamp).join(models.Assignment).filter(
-            models.Assignment.course_id == course_id,
-            models.Submission.timestamp >= start_date
+        rows = self.db.query(models.CourseDailyActivity).filter(
+            models.CourseDailyActivity.course_id == course_id,
+            models.CourseDailyActivity.day >= start_day,
+            models.CourseDailyActivity.day <= today
         ).all()
-        
-        # Initialize days
-        daily_stats = {}
-        for i in range(days):
-            date_key = (datetime.utcnow() - timedelta(days=i)).strftime('%Y-%m-%d')
-            daily_stats[date_key] = {"posts": 0, "submissions": 0}
-
-        # Aggregate Posts
-        for p in posts:
-            if p.timestamp:
-                 k = p.timestamp.strftime('%Y-%m-%d')
-                 if k in daily_stats: daily_stats[k]["posts"] += 1
-        
-        # Aggregate Submissions
-        for s in submissions:
-             if s.timestamp:
-                 k = s.timestamp.strftime('%Y-%m-%d')
-                 if k in daily_stats: daily_stats[k]["submissions"] += 1
-        
-        # Convert to sorted list
+        by_day = {row.day: row for row in rows}
+
+        # Fill in days without activity
         timeline = []
-        for date_key in sorted(daily_stats.keys()):
-            stats = daily_stats[date_key]
+        for i in range(days):
+            day = start_day + timedelta(days=i)
+            row = by_day.get(day)
             timeline.append({
-                "date": date_key,
-                "posts": stats["posts"],
-                "submissions": stats["submissions"]
+                "date": day.strftime('%Y-%m-%d'),
+                "posts": row.posts if row else 0,
+                "comments": row.comments if row else 0,
+                "submissions": row.submissions if row else 0
             })
         return timeline
 
+    @staticmethod
+    def record_activity(db: Session, course_id: int, posts: int = 0, comments: int = 0, submissions: int = 0, day: date = None):
+        """
+        Adjusts a day's activity rollup for the course (today by default). Runs in the caller's
+        transaction. Like rebuild_activity_rollup, the counters are the rows that currently exist
+        per day of their timestamp, so callers pass negative deltas when rows go away or move.
+        """
+        activity = models.CourseDailyActivity
+        stmt = insert(activity).values(
+            course_id=course_id,
+            day=day or datetime.utcnow().date(),
+            posts=posts,
+            comments=comments,
+            submissions=submissions
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[activity.course_id, activity.day],
+            set_={
+                "posts": activity.posts + stmt.excluded.posts,
+                "comments": activity.comments + stmt.excluded.comments,
+                "submissions": activity.submissions + stmt.excluded.submissions
+            }
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def record_post_deleted(db: Session, post: models.Post):
+        """Takes a post and its comments (deleted with it) out of the activity rollup."""
+        if post.timestamp:
+            AnalyticsService.record_activity(db, post.course_id, posts=-1, day=post.timestamp.date())
+        comment_days = db.query(cast(models.Comment.timestamp, Date), func.count(models.Comment.id)).filter(
+            models.Comment.post_id == post.id,
+            models.Comment.timestamp.isnot(None)
+        ).group_by(cast(models.Comment.timestamp, Date)).all()
+        for day, count in comment_days:
+            AnalyticsService.record_activity(db, post.course_id, comments=-count, day=day)
+
+    @staticmethod
+    def rebuild_activity_rollup(db: Session, course_id: int = None):
+        """Recomputes the activity rollup from posts, comments and submissions (backfill)."""
+        posts = select(
+            models.Post.course_id.label("course_id"),
+            cast(models.Post.timestamp, Date).label("day"),
+            literal(1).label("posts"), literal(0).label("comments"), literal(0).label("submissions")
+        )
+        comments = select(
+            models.Post.course_id,
+            cast(models.Comment.timestamp, Date),
+            literal(0), literal(1), literal(0)
+        ).join(models.Post, models.Comment.post_id == models.Post.id)
+        submissions = select(
+            models.Assignment.course_id,
+            cast(models.Submission.timestamp, Date),
+            literal(0), literal(0), literal(1)
+        ).join(models.Assignment, models.Submission.assignment_id == models.Assignment.id)
+
+        if course_id is not None:
+            posts = posts.where(models.Post.course_id == course_id)
+            comments = comments.where(models.Post.course_id == course_id)
+            submissions = submissions.where(models.Assignment.course_id == course_id)
+
+        events = union_all(posts, comments, submissions).subquery()
+        grouped = select(
+            events.c.course_id,
+            events.c.day,
+            func.sum(events.c.posts),
+            func.sum(events.c.comments),
+            func.sum(events.c.submissions)
+        ).where(events.c.day.isnot(None)).group_by(events.c.course_id, events.c.day)
+
+        existing = db.query(models.CourseDailyActivity)
+        if course_id is not None:
+            existing = existing.filter(models.CourseDailyActivity.course_id == course_id)
+        existing.delete(synchronize_session=False)
+
+        db.execute(insert(models.CourseDailyActivity).from_select(
+            ["course_id", "day", "posts", "comments", "submissions"], grouped
+        ))
+        db.commit()
+
     def get_assignment_analytics(self, course_id: int):
         """Returns submission status and grade distributions."""
-        assignments = self.db.query(models.Assignment).filter_by(course_id=course_id).all()
-        enrolled_count = self.db.query(models.CourseEnrollment).filter_by(course_id=course_id).count()
-        
-        if not assignments:
+        enrolled_count = self.db.query(func.count(models.CourseEnrollment.user_id)).filter(
+            models.CourseEnrollment.course_id == course_id
+        ).scalar_subquery()
+
+        # Single grouped pass in PostgreSQL: one row of counters per assignment
+        rows = self.db.query(
+            models.Assignment.id,
+            models.Assignment.title,
+            func.count(models.Submission.id).label("submitted"),
+            func.count(models.Submission.id).filter(_is_late()).label("late"),
+            func.greatest(enrolled_count - func.count(distinct(models.Submission.student_id)), 0).label("missing"),
+            *_grade_bucket_counts()
+        ).outerjoin(
+            models.Submission, models.Submission.assignment_id == models.Assignment.id
+        ).filter(
+            models.Assignment.course_id == course_id
+        ).group_by(models.Assignment.id).order_by(models.Assignment.id).all()
+
+        if not rows:
             return {}
 
-        total_submissions = 0
-        late_submissions = 0
-        missing_submissions = 0
-        
-        grades_dist = {"A": 0, "B": 0, "C": 0, "D": 0, "F": 0}
-        
-        for assignment in assignments:
-            submissions = self.db.query(models.Submission).filter_by(assignment_id=assignment.id).all()
-            
-            submitted_user_ids = {sub.student_id for sub in submissions}
-            missing = max(0, enrolled_count - len(submitted_user_ids))
-            
-            total_submissions += len(submissions)
-            missing_submissions += missing
-            
-            for sub in submissions:
-                if sub.timestamp and assignment.due_date and sub.timestamp > assignment.due_date:
-                    late_submissions += 1
-                
-                # Grade is Integer
-                if sub.grade is not None:
-                    g = sub.grade
-                    if g >= 90: grades_dist["A"] += 1
-                    elif g >= 80: grades_dist["B"] += 1
-                    elif g >= 70: grades_dist["C"] += 1
-                    elif g >= 60: grades_dist["D"] += 1
-                    else: grades_dist["F"] += 1
-
-        status_breakdown = {
-            "submitted": total_submissions - late_submissions,
-            "late": late_submissions,
-            "missing": missing_submissions
-        }
+        status_breakdown = {"submitted": 0, "late": 0, "missing": 0}
+        grades_dist = {bucket: 0 for bucket in GRADE_BUCKETS}
+        per_assignment = []
+
+        for row in rows:
+            status_breakdown["submitted"] += row.submitted - row.late
+            status_breakdown["late"] += row.late
+            status_breakdown["missing"] += row.missing
+            for bucket in grades_dist:
+                grades_dist[bucket] += getattr(row, bucket)
+
+            per_assignment.append({
+                "assignment_id": row.id,
+                "title": row.title,
+                "submitted": row.submitted - row.late,
+                "late": row.late,
+                "missing": row.missing
+            })
 
         return {
             "status_breakdown": status_breakdown,
-            "grades_distribution": grades_dist
+            "grades_distribution": grades_dist,
+            "per_assignment": per_assignment
         }
 
     def get_assignment_difficulty(self, course_id: int):
         """Calculates difficulty indicators per assignment."""
-        assignments = self.db.query(models.Assignment).filter_by(course_id=course_id).all()
+        grade = models.Submission.grade
+        normalized = grade * 100.0 / func.nullif(models.Assignment.max_points, 0)
+
+        rows = self.db.query(
+            models.Assignment.id,
+            models.Assignment.title,
+            models.Assignment.max_points,
+            func.count(models.Submission.id).label("submission_count"),
+            func.avg(grade).label("avg_grade"),
+            func.percentile_cont(0.5).within_group(grade).label("median_grade"),
+            func.stddev_pop(grade).label("stddev_grade"),
+            func.avg(normalized).label("avg_score_pct")
+        ).outerjoin(
+            models.Submission, models.Submission.assignment_id == models.Assignment.id
+        ).filter(
+            models.Assignment.course_id == course_id
+        ).group_by(models.Assignment.id).order_by(models.Assignment.id).all()
+
         data = []
-        
-        for a in assignments:
-            subs = self.db.query(models.Submission).filter_by(assignment_id=a.id).all()
-            count = len(subs)
-            if count == 0:
-                avg_grade = 0
-            else:
-                # Grade is Integer
-                valid_grades = [s.grade for s in subs if s.grade is not None]
-                if valid_grades:
-                    avg_grade = sum(valid_grades) / len(valid_grades)
-                else:
-                    avg_grade = 0
-            
+        for row in rows:
+            # Aggregates are NULL when nothing has been graded yet
             data.append({
-                "title": a.title,
-                "submission_count": count,
-                "avg_grade": round(avg_grade, 2)
+                "assignment_id": row.id,
+                "title": row.title,
+                "max_points": row.max_points,
+                "submission_count": row.submission_count,
+                "avg_grade": round(float(row.avg_grade or 0), 2),
+                "median_grade": round(float(row.median_grade or 0), 2),
+                "stddev_grade": round(float(row.stddev_grade or 0), 2),
+                "avg_score_pct": round(float(row.avg_score_pct or 0), 2)
             })
-            
+
         return data
 
-    def get_course_completion(self, course_id: int):
+    def get_course_completion(self, course_id: int, counts: dict = None):
         """Estimates course completion status."""
-        enrolled = self.db.query(models.CourseEnrollment).filter_by(course_id=course_id).count()
-        assignments = self.db.query(models.Assignment).filter_by(course_id=course_id).count()
+        counts = counts or self.get_course_counts(course_id)
+        enrolled = counts["enrolled"]
+        assignments = counts["assignments"]
         
         if enrolled == 0 or assignments == 0:
             return 0
             
         total_possible_subs = enrolled * assignments
-        actual_subs = self.db.query(models.Submission).join(models.Assignment).filter(models.Assignment.course_id == course_id).count()
-        
-        return round((actual_subs / total_possible_subs) * 100, 1)
+        return round((counts["submissions"] / total_possible_subs) * 100, 1)
+
+    def get_teacher_course_ids(self, teacher_id: int):
+        """Returns the IDs of every course taught by the teacher."""
+        return [row.id for row in self.db.query(models.Course.id).filter(
+            models.Course.teacher_id == teacher_id
+        ).order_by(models.Course.id)]
+
+    def get_batch_course_analytics(self, course_ids, chunk_size: int = BATCH_CHUNK_SIZE):
+        """Yields KPIs, completion and grade distributions per course, two grouped queries per chunk of courses."""
+        for start in range(0, len(course_ids), chunk_size):
+            yield from self._get_batch_chunk(course_ids[start:start + chunk_size])
+
+    def _get_batch_chunk(self, course_ids):
+        now = datetime.utcnow()
+        enrolled = select(
+            models.CourseEnrollment.course_id,
+            func.count().label("enrolled")
+        ).where(models.CourseEnrollment.course_id.in_(course_ids)).group_by(models.CourseEnrollment.course_id).subquery()
+        assignment_counts = select(
+            models.Assignment.course_id,
+            func.count().label("assignments"),
+            func.count().filter(models.Assignment.due_date >= now).label("upcoming")
+        ).where(models.Assignment.course_id.in_(course_ids)).group_by(models.Assignment.course_id).subquery()
+
+        # 1. Per-course counts
+        courses = self.db.query(
+            models.Course.id,
+            models.Course.title,
+            func.coalesce(enrolled.c.enrolled, 0).label("enrolled"),
+            func.coalesce(assignment_counts.c.assignments, 0).label("assignments"),
+            func.coalesce(assignment_counts.c.upcoming, 0).label("upcoming")
+        ).outerjoin(
+            enrolled, enrolled.c.course_id == models.Course.id
+        ).outerjoin(
+            assignment_counts, assignment_counts.c.course_id == models.Course.id
+        ).filter(models.Course.id.in_(course_ids)).all()
+
+        # 2. Per-assignment submission counters, rolled up per course
+        per_assignment = select(
+            models.Assignment.course_id,
+            func.count(models.Submission.id).label("submitted"),
+            func.count(models.Submission.id).filter(_is_late()).label("late"),
+            func.count(distinct(models.Submission.student_id)).label("submitters"),
+            *_grade_bucket_counts()
+        ).outerjoin(
+            models.Submission, models.Submission.assignment_id == models.Assignment.id
+        ).where(models.Assignment.course_id.in_(course_ids)).group_by(models.Assignment.id).subquery()
+
+        submission_rows = self.db.query(
+            per_assignment.c.course_id,
+            func.sum(per_assignment.c.submitted).label("submitted"),
+            func.sum(per_assignment.c.late).label("late"),
+            func.sum(func.greatest(func.coalesce(enrolled.c.enrolled, 0) - per_assignment.c.submitters, 0)).label("missing"),
+            *[func.sum(per_assignment.c[bucket]).label(bucket) for bucket in GRADE_BUCKETS]
+        ).outerjoin(
+            enrolled, enrolled.c.course_id == per_assignment.c.course_id
+        ).group_by(per_assignment.c.course_id).all()
+        stats_by_course = {row.course_id: row for row in submission_rows}
+
+        for course in courses:
+            counts = {
+                "enrolled": course.enrolled,
+                "assignments": course.assignments,
+                "upcoming": course.upcoming,
+                "submissions": 0
+            }
+            assignment_stats = {}
+            stats = stats_by_course.get(course.id)
+            if stats:
+                counts["submissions"] = int(stats.submitted)
+                assignment_stats = {
+                    "status_breakdown": {
+                        "submitted": int(stats.submitted - stats.late),
+                        "late": int(stats.late),
+                        "missing": int(stats.missing)
+                    },
+                    "grades_distribution": {bucket: int(getattr(stats, bucket)) for bucket in GRADE_BUCKETS}
+                }
+
+            yield {
+                "course_id": course.id,
+                "title": course.title,
+                "kpis": self.get_quick_kpis(course.id, counts),
+                "course_completion": self.get_course_completion(course.id, counts),
+                "assignment_stats": assignment_stats
+            }
+
+    def iter_gradebook(self, course_id: int, batch_size: int = GRADEBOOK_BATCH_SIZE):
+        """
+        Yields the course gradebook (every enrolled student x every assignment) row by row,
+        streamed from a server-side cursor in batches of batch_size.
+        """
+        stmt = select(
+            models.User.id.label("student_id"),
+            models.User.name.label("student_name"),
+            models.User.email.label("student_email"),
+            models.Assignment.id.label("assignment_id"),
+            models.Assignment.title.label("assignment_title"),
+            models.Assignment.max_points,
+            models.Assignment.due_date,
+            models.Submission.grade,
+            models.Submission.is_late,
+            models.Submission.timestamp.label("submitted_at")
+        ).select_from(models.CourseEnrollment).join(
+            models.User, models.User.id == models.CourseEnrollment.user_id
+        ).join(
+            models.Assignment, models.Assignment.course_id == models.CourseEnrollment.course_id
+        ).outerjoin(
+            models.Submission,
+            (models.Submission.assignment_id == models.Assignment.id) & (models.Submission.student_id == models.User.id)
+        ).where(
+            models.CourseEnrollment.course_id == course_id
+        ).order_by(models.User.name, models.User.id, models.Assignment.due_date, models.Assignment.id)
+
+        result = self.db.execute(stmt.execution_options(yield_per=batch_size))
+        for row in result:
+            yield row
+
+    def get_full_dashboard(self, course_id: int, days: int = 7):
+        """Assembles every dashboard section; latency is that of the slowest section, not the sum."""
+        sections = {
+            "engagement_timeline": lambda service: service.get_engagement_timeline(course_id, days=days),
+            "assignment_stats": lambda service: service.get_assignment_analytics(course_id),
+            "difficulty_indicators": lambda service: service.get_assignment_difficulty(course_id)
+        }
+        futures = {name: _dashboard_executor.submit(_run_section, section) for name, section in sections.items()}
+
+        # The shared counts run on this session while the other sections run on pooled ones
+        counts = self.get_course_counts(course_id)
+        dashboard = {
+            "kpis": self.get_quick_kpis(course_id, counts),
+            "course_completion": self.get_course_completion(course_id, counts)
+        }
+        for name, future in futures.items():
+            dashboard[name] = future.result()
+
+        return {key: dashboard[key] for key in DASHBOARD_SECTIONS}
+
+    def get_roster(self, course_id: int):
+        return self.db.query(models.User.id, models.User.name).join(models.CourseEnrollment).filter(
+            models.CourseEnrollment.course_id == course_id
+        ).all()
+
+    async def get_event_analytics(self, course_id: int, days: int = 7):
+        """
+        Per-day activity, event type breakdown and student engagement scores computed from the
+        Cassandra event log instead of PostgreSQL. Only the roster is read from PostgreSQL.
+        """
+        days = max(1, min(days, settings.ANALYTICS_MAX_TIMELINE_DAYS))
+        end = datetime.combine(datetime.utcnow().date() + timedelta(days=1), datetime.min.time())
+        start = end - timedelta(days=days)
+        # The roster query is blocking SQLAlchemy, so it runs on the threadpool alongside the event reads
+        events, students = await asyncio.gather(
+            EventLogReader.read_events(course_id, start, end),
+            run_in_threadpool(self.get_roster, course_id)
+        )
+        engagement = {
+            student.id: {"student_id": student.id, "name": student.name, "score": 0, "events": {}, "last_active": None}
+            for student in students
+        }
+
+        by_day = {}
+        event_types = {}
+        for event in events:
+            day = event.event_time.strftime('%Y-%m-%d')
+            by_day.setdefault(day, {})
+            by_day[day][event.event_type] = by_day[day].get(event.event_type, 0) + 1
+            event_types[event.event_type] = event_types.get(event.event_type, 0) + 1
+
+            student = engagement.get(event.user_id)
+            if student:
+                student["score"] += ENGAGEMENT_WEIGHTS.get(event.event_type, 0)
+                student["events"][event.event_type] = student["events"].get(event.event_type, 0) + 1
+                # Events arrive newest first
+                if student["last_active"] is None:
+                    student["last_active"] = str(event.event_time)
+
+        daily_activity = []
+        for i in range(days):
+            day = (start + timedelta(days=i)).strftime('%Y-%m-%d')
+            counts = by_day.get(day, {})
+            daily_activity.append({"date": day, "total": sum(counts.values()), "events": counts})
+
+        return {
+            "total_events": len(events),
+            "daily_activity": daily_activity,
+            "event_types": dict(sorted(event_types.items(), key=lambda item: item[1], reverse=True)),
+            "student_engagement": sorted(engagement.values(), key=lambda student: student["score"], reverse=True)
+        }
+
+def _run_section(section):
+    # Sessions are not thread-safe, so each section gets its own pooled connection
+    db = SessionLocal()
+    try:
+        return section(AnalyticsService(db))
+    finally:
+        db.close()
@@ -0,0 +1,202 @@
+from starlette.concurrency import run_in_threadpool
+from app.core import minio_client
+from app.core.redis_db import redis_client
+from app.core.config import settings
+from typing import BinaryIO, Optional
+import asyncio
+import fcntl
+import hashlib
+import os
+import stat
+
+STATS_KEY = "attachments:cache:stats"
+MB = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+
+class AttachmentCache:
+    """
+    Size-bounded LRU of attachment objects on local disk, shared by every worker process on
+    the host. Entries are keyed by bucket, object name and ETag, so a replaced object never
+    serves stale bytes. A file's mtime is its last use; once the directory grows past
+    ATTACHMENT_CACHE_MAX_MB the least recently used files are removed.
+    Concurrent misses for one object share a single MinIO download: within a process they
+    await the same task, and across processes they queue on a flock() for the entry.
+    """
+    _inflight = {} # cache path -> asyncio.Task filling it
+    _root_checked = False
+
+    @staticmethod
+    def accepts(size: int) -> bool:
+        return settings.ATTACHMENT_CACHE_MAX_MB > 0 and size <= settings.ATTACHMENT_CACHE_MAX_OBJECT_MB * MB
+
+    @staticmethod
+    def path(bucket: str, object_name: str, etag: str) -> str:
+        digest = hashlib.sha256(f"{bucket}/{object_name}\0{etag}".encode()).hexdigest()
+        return os.path.join(settings.ATTACHMENT_CACHE_DIR, digest[:2], digest)
+
+    @staticmethod
+    def _check_root():
+        """
+        Creates the cache directory private to this user, and refuses one that someone else
+        could write to (the default lives under /tmp), since its files are served as attachments.
+        """
+        root = settings.ATTACHMENT_CACHE_DIR
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        root_stat = os.lstat(root)
+        if not stat.S_ISDIR(root_stat.st_mode) or root_stat.st_uid != os.getuid() or root_stat.st_mode & 0o077:
+            raise PermissionError(f"Attachment cache directory {root} must be a directory only this user can access")
+        AttachmentCache._root_checked = True
+
+    @staticmethod
+    def open_file(path: str) -> Optional[BinaryIO]:
+        """
+        Opens a cached file (and marks it recently used), or returns None on a miss. The open
+        file stays readable even if another worker evicts the entry meanwhile.
+        """
+        if not AttachmentCache._root_checked:
+            AttachmentCache._check_root()
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(file.fileno())
+        return file
+
+    @staticmethod
+    def lookup(path: str) -> Optional[BinaryIO]:
+        """Opens the cached file on a hit, or returns None on a miss."""
+        file = AttachmentCache.open_file(path)
+        if file is not None:
+            redis_client.hincrby(STATS_KEY, "hits", 1)
+        return file
+
+    @staticmethod
+    async def fetch(bucket: str, object_name: str, etag: str, path: str) -> Optional[os.stat_result]:
+        """Downloads the object into the cache (once, however many requests miss together)."""
+        task = AttachmentCache._inflight.get(path)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(AttachmentCache._fill, bucket, object_name, etag, path))
+            AttachmentCache._inflight[path] = task
+            task.add_done_callback(lambda _: AttachmentCache._inflight.pop(path, None))
+            counter = "misses"
+        else:
+            counter = "coalesced"
+        await run_in_threadpool(redis_client.hincrby, STATS_KEY, counter, 1)
+        try:
+            # Shielded so a client disconnecting does not abort the download for the others
+            return await asyncio.shield(task)
+        except Exception as e:
+            print(f"Failed to cache {bucket}/{object_name}: {e}")
+            return None
+
+    @staticmethod
+    def _fill(bucket: str, object_name: str, etag: str, path: str) -> os.stat_result:
+        AttachmentCache._check_root()
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # One lock file per prefix directory keeps the lock count bounded
+        with open(os.path.join(directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path):
+                    # Another worker filled it while this one waited
+                    return os.stat(path)
+
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                try:
+                    response = minio_client.get_minio_client().get_object(
+                        bucket, object_name, request_headers={"If-Match": f'"{etag}"'}
+                    )
+                    try:
+                        with open(tmp_path, "wb") as f:
+                            for chunk in response.stream(CHUNK_SIZE):
+                                f.write(chunk)
+                    finally:
+                        response.close()
+                        response.release_conn()
+                    os.replace(tmp_path, path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        stat = os.stat(path)
+        pipe = redis_client.pipeline()
+        pipe.hincrby(STATS_KEY, "fills", 1)
+        pipe.hincrby(STATS_KEY, "filled_bytes", stat.st_size)
+        pipe.execute()
+        AttachmentCache._evict()
+        return stat
+
+    @staticmethod
+    def _entries():
+        root = settings.ATTACHMENT_CACHE_DIR
+        if not os.path.isdir(root):
+            return
+        for prefix in os.scandir(root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.is_file() and not entry.name.startswith(".") and not entry.name.endswith(".tmp"):
+                    yield entry
+
+    @staticmethod
+    def _evict():
+        """Removes least recently used files until the cache is back under 90% of its limit."""
+        with open(os.path.join(settings.ATTACHMENT_CACHE_DIR, ".evict.lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is already evicting
+                return
+            try:
+                files = []
+                for entry in AttachmentCache._entries():
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+                total = sum(size for _, size, _ in files)
+                if total <= settings.ATTACHMENT_CACHE_MAX_MB * MB:
+                    return
+                target = settings.ATTACHMENT_CACHE_MAX_MB * MB * 0.9
+                evicted = 0
+                for _, size, file_path in sorted(files):
+                    if total <= target:
+                        break
+                    try:
+                        # Responses that already opened the file keep reading it
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+                    evicted += 1
+                redis_client.hincrby(STATS_KEY, "evictions", evicted)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def get_stats():
+        stats = {k: int(v) for k, v in redis_client.hgetall(STATS_KEY).items()}
+        for counter in ("hits", "misses", "coalesced", "fills", "filled_bytes", "evictions"):
+            stats.setdefault(counter, 0)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        # Coalesced requests waited on another request's download rather than hitting MinIO
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["minio_fetch_ratio"] = round(stats["fills"] / lookups, 4) if lookups else 0.0
+
+        entries = 0
+        size = 0
+        for entry in AttachmentCache._entries():
+            try:
+                size += entry.stat().st_size
+                entries += 1
+            except FileNotFoundError:
+                pass
+        stats["entries"] = entries
+        stats["size_bytes"] = size
+        return stats
@@ -0,0 +1,173 @@
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse, RedirectResponse
+from starlette.concurrency import run_in_threadpool
+from app.core import minio_client
+from app.core.config import settings
+from app.services.upload_service import UploadService, BLOB_PREFIX, blob_key
+from app.services.attachment_cache import AttachmentCache
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+# Object keys contain a UUID or a content hash, so the bytes behind a URL never change
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def attachment_filename(path: str) -> str:
+    # Extract filename (it's after the uuid_)
+    filename = path.split("/")[-1]
+    if "_" in filename:
+        filename = filename.split("_", 1)[1]
+    return filename
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=" range into inclusive (start, end). Returns None to serve the
+    whole object (no header, or a multi-range request) and raises 416 if unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[6:].strip().partition("-")
+    try:
+        if start:
+            first = int(start)
+            last = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            first = max(size - int(end), 0)
+            last = size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, last
+
+def _read_file(file, offset: int, length: int):
+    try:
+        file.seek(offset)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+def _stream(response):
+    try:
+        yield from response.stream(STREAM_CHUNK_SIZE)
+    finally:
+        response.close()
+        response.release_conn()
+
+class AttachmentService:
+    """
+    Serves attachment objects from MinIO with the validators and range support browsers
+    need to cache files and seek in videos: every request starts with a stat, which answers
+    conditional requests without reading the object. Small and medium objects are then served
+    from the local disk cache; larger ones are streamed, with ranges read as partial GETs.
+    """
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, last_modified) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    async def serve(request: Request, db: Session, bucket: str, url_prefix: str, path: str, download: bool = False) -> Response:
+        filename = attachment_filename(path)
+        if path.startswith(BLOB_PREFIX):
+            # Shared blobs are only reachable through an attachment row's own URL
+            content_hash = await run_in_threadpool(UploadService.resolve_blob, db, bucket, f"{url_prefix}/{path}")
+            if not content_hash:
+                raise HTTPException(status_code=404, detail="Attachment not found")
+            path = blob_key(content_hash)
+        if settings.STORAGE_PRESIGNED:
+            # The client fetches the bytes from MinIO directly
+            return RedirectResponse(UploadService.presign_get(bucket, path, filename, download), status_code=302)
+
+        client = minio_client.get_minio_client()
+        try:
+            stat = await run_in_threadpool(client.stat_object, bucket, path)
+        except Exception:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+
+        etag = f'"{stat.etag}"'
+        disposition = "attachment" if download else "inline"
+        headers = {
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'{disposition}; filename="{filename}"'
+        }
+        if stat.last_modified:
+            headers["Last-Modified"] = format_datetime(stat.last_modified, usegmt=True)
+
+        if AttachmentService._not_modified(request, etag, stat.last_modified):
+            return Response(status_code=304, headers=headers)
+
+        # Ranges are parsed the same way for cached and streamed objects; a malformed one gets the whole object
+        byte_range = parse_range(request.headers.get("range"), stat.size)
+        if byte_range and request.headers.get("if-range", etag) != etag:
+            # The client's partial copy is stale, so it gets the whole object
+            byte_range = None
+
+        if byte_range:
+            first, last = byte_range
+            offset, length, status_code = first, last - first + 1, 206
+            headers["Content-Range"] = f"bytes {first}-{last}/{stat.size}"
+        else:
+            offset, length, status_code = 0, stat.size, 200
+        headers["Content-Length"] = str(length)
+
+        if length == 0:
+            return Response(status_code=status_code, headers=headers, media_type=stat.content_type)
+
+        if AttachmentCache.accepts(stat.size):
+            cache_path = AttachmentCache.path(bucket, path, stat.etag)
+            try:
+                cached = await run_in_threadpool(AttachmentCache.lookup, cache_path)
+                if cached is None and await AttachmentCache.fetch(bucket, path, stat.etag, cache_path) is not None:
+                    cached = await run_in_threadpool(AttachmentCache.open_file, cache_path)
+            except OSError as e:
+                print(f"Attachment cache unavailable: {e}")
+                cached = None
+            if cached is not None:
+                # Already open, so eviction by another worker cannot pull the file from under the response.
+                # If it went before the open, the object is streamed from MinIO below.
+                return StreamingResponse(
+                    _read_file(cached, offset, length),
+                    status_code=status_code,
+                    media_type=stat.content_type,
+                    headers=headers
+                )
+
+        try:
+            # If-Match guards against the object being replaced between the stat and the read
+            response = await run_in_threadpool(
+                client.get_object, bucket, path,
+                offset=offset, length=length, request_headers={"If-Match": etag}
+            )
+        except Exception:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        return StreamingResponse(
+            _stream(response),
+            status_code=status_code,
+            media_type=stat.content_type,
+            headers=headers
+        )
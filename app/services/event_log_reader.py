@@ -0,0 +1,39 @@
+from app.core import cassandra_db
+from app.core.config import settings
+from app.services.event_logger import event_day
+from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
+import heapq
+
+def day_buckets(start: datetime, end: datetime) -> List[str]:
+    """Day partitions overlapping [start, end), newest first."""
+    days = []
+    day = (end - timedelta(microseconds=1)).date()
+    while day >= start.date():
+        days.append(event_day(day))
+        day -= timedelta(days=1)
+    return days
+
+class EventLogReader:
+    """Reads event_logs_by_day across day partitions."""
+
+    @staticmethod
+    async def read_events(course_id: int, start: datetime, end: datetime, event_types: Optional[List[str]] = None):
+        """
+        Events of a course with start <= event_time < end (naive UTC), newest first.
+        Every day bucket is queried concurrently and the sorted buckets are merged.
+        """
+        statement = await asyncio.to_thread(cassandra_db.get_statement, "select_events")
+        session = cassandra_db.cassandra_client.session
+        semaphore = asyncio.Semaphore(settings.EVENT_LOG_READ_CONCURRENCY)
+
+        async def read_bucket(day: str):
+            async with semaphore:
+                return await cassandra_db.execute_async(session, statement, (course_id, day, start, end))
+
+        buckets = await asyncio.gather(*(read_bucket(day) for day in day_buckets(start, end)))
+        events = heapq.merge(*buckets, key=lambda row: row.event_time, reverse=True)
+        if event_types:
+            return [row for row in events if row.event_type in event_types]
+        return list(events)
@@ -0,0 +1,149 @@
+from cassandra.query import BatchStatement, BatchType
+from app.core import cassandra_db
+from app.core.config import settings
+from collections import deque
+from datetime import datetime
+import asyncio
+import json
+import threading
+import uuid
+
+MAX_BACKOFF_EXPONENT = 16
+
+def event_day(dt: datetime) -> str:
+    """Partition bucket of an event in event_logs_by_day."""
+    return dt.strftime("%Y-%m-%d")
+
+async def _wait(event: asyncio.Event, timeout: float):
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+class EventLogger:
+    """
+    Buffers analytics events in memory and writes them to Cassandra from a background task,
+    so request handlers never wait on Cassandra. The buffer is a bounded ring: when it is
+    full the oldest event is dropped and counted. Events are written with execute_async in
+    UNLOGGED batches, one per partition, which Cassandra applies as a single mutation.
+    """
+    def __init__(self):
+        self.buffer = deque(maxlen=settings.EVENT_LOG_BUFFER_SIZE)
+        self.lock = threading.Lock()
+        self.loop = None
+        self.wakeup = None
+        self.stopping = None
+        self.task = None
+        self.stats = {"logged": 0, "written": 0, "dropped": 0, "failed": 0}
+
+    def log(self, event_type: str, user_id: int, course_id: int, details: dict):
+        """Queues an event; safe to call from the event loop or from worker threads."""
+        now = datetime.utcnow()
+        # Column order of the insert_event statement
+        event = (course_id, event_day(now), now, uuid.uuid4(), event_type, user_id, json.dumps(details))
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.stats["dropped"] += 1
+            self.buffer.append(event)
+            self.stats["logged"] += 1
+            backlog = len(self.buffer)
+        # Backpressure: flush early instead of waiting for the interval once the buffer fills up
+        if backlog >= settings.EVENT_LOG_FLUSH_THRESHOLD and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the flusher and writes whatever is still buffered."""
+        if self.task:
+            # Not cancelled: that could abort a flush and lose the events it already took off the buffer
+            self.stopping.set()
+            self.wakeup.set()
+            await self.task
+        while self.buffer:
+            await self.flush()
+        self.loop = self.wakeup = self.stopping = self.task = None
+
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "buffered": len(self.buffer)}
+
+    async def _run(self):
+        failures = 0
+        while not self.stopping.is_set():
+            if failures:
+                # While Cassandra keeps failing, back off (events keep buffering; backpressure
+                # wakeups don't cut the pause short, stopping does). The exponent is capped so a
+                # long outage cannot overflow the float multiplication.
+                await _wait(self.stopping, min(
+                    settings.EVENT_LOG_FLUSH_INTERVAL_SECONDS * 2 ** min(failures, MAX_BACKOFF_EXPONENT),
+                    settings.EVENT_LOG_MAX_BACKOFF_SECONDS
+                ))
+            else:
+                await _wait(self.wakeup, settings.EVENT_LOG_FLUSH_INTERVAL_SECONDS)
+            if self.stopping.is_set():
+                # stop() drains the rest
+                break
+            self.wakeup.clear()
+            try:
+                while self.buffer:
+                    if not await self.flush():
+                        failures += 1
+                        break
+                else:
+                    failures = 0
+            except Exception as e:
+                # Never let the flusher die: events would silently pile up and be dropped
+                print(f"Event log flusher error: {e}")
+                failures += 1
+
+    async def flush(self) -> bool:
+        """Writes up to EVENT_LOG_FLUSH_MAX_EVENTS buffered events; returns False if any failed."""
+        with self.lock:
+            events = [self.buffer.popleft() for _ in range(min(len(self.buffer), settings.EVENT_LOG_FLUSH_MAX_EVENTS))]
+        if not events:
+            return True
+
+        try:
+            # Connecting (or failing to) blocks, so it happens off the event loop
+            statement = await asyncio.to_thread(cassandra_db.get_statement, "insert_event")
+            session = cassandra_db.cassandra_client.session
+        except Exception as e:
+            print(f"Failed to log {len(events)} events to Cassandra: {e}")
+            self._count("failed", len(events))
+            return False
+
+        partitions = {}
+        for event in events:
+            partitions.setdefault(event[:2], []).append(event) # (course_id, day)
+
+        batches = []
+        for partition_events in partitions.values():
+            for i in range(0, len(partition_events), settings.EVENT_LOG_BATCH_SIZE):
+                batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+                for event in partition_events[i:i + settings.EVENT_LOG_BATCH_SIZE]:
+                    batch.add(statement, event)
+                batches.append((batch, len(batch)))
+
+        results = await asyncio.gather(
+            *(cassandra_db.execute_async(session, batch) for batch, _ in batches), return_exceptions=True
+        )
+        ok = True
+        for (_, size), result in zip(batches, results):
+            if isinstance(result, Exception):
+                print(f"Failed to log {size} events to Cassandra: {result}")
+                self._count("failed", size)
+                ok = False
+            else:
+                self._count("written", size)
+        return ok
+
+    def _count(self, key: str, amount: int):
+        with self.lock:
+            self.stats[key] += amount
+
+event_logger = EventLogger()
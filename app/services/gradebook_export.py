@@ -0,0 +1,81 @@
+from app.core.database import SessionLocal
+from app.services.analytics_service import AnalyticsService, GRADEBOOK_BATCH_SIZE
+import csv
+import io
+import tempfile
+
+GRADEBOOK_COLUMNS = [
+    "student_id", "student_name", "student_email",
+    "assignment_id", "assignment_title", "max_points", "due_date",
+    "grade", "is_late", "submitted_at"
+]
+
+CHUNK_SIZE = 64 * 1024
+
+class GradebookExport:
+    """Streams a course gradebook in constant memory. Each export uses its own session."""
+
+    @staticmethod
+    def stream_csv(course_id: int):
+        db = SessionLocal()
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(GRADEBOOK_COLUMNS)
+
+            for row in AnalyticsService(db).iter_gradebook(course_id):
+                writer.writerow([
+                    row.student_id, row.student_name, row.student_email,
+                    row.assignment_id, row.assignment_title, row.max_points, row.due_date.isoformat(),
+                    row.grade if row.grade is not None else "",
+                    row.is_late if row.submitted_at is not None else "",
+                    row.submitted_at.isoformat() if row.submitted_at else ""
+                ])
+                if buffer.tell() >= CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+
+            yield buffer.getvalue()
+        finally:
+            db.close()
+
+    @staticmethod
+    def stream_parquet(course_id: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("student_id", pa.int64()),
+            ("student_name", pa.string()),
+            ("student_email", pa.string()),
+            ("assignment_id", pa.int64()),
+            ("assignment_title", pa.string()),
+            ("max_points", pa.int64()),
+            ("due_date", pa.timestamp("us")),
+            ("grade", pa.int64()),
+            ("is_late", pa.bool_()),
+            ("submitted_at", pa.timestamp("us"))
+        ])
+
+        # Parquet writes its footer last, so row groups are spooled to a temp file
+        # one batch at a time and the file is streamed once complete.
+        db = SessionLocal()
+        with tempfile.TemporaryFile() as spool:
+            try:
+                writer = pq.ParquetWriter(spool, schema)
+                batch = []
+                for row in AnalyticsService(db).iter_gradebook(course_id):
+                    batch.append(row._asdict())
+                    if len(batch) >= GRADEBOOK_BATCH_SIZE:
+                        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                        batch = []
+                if batch:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                writer.close()
+            finally:
+                db.close()
+
+            spool.seek(0)
+            while chunk := spool.read(CHUNK_SIZE):
+                yield chunk
@@ -0,0 +1,69 @@
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.services.notification_service import NotificationService
+import asyncio
+
+class NotificationBroker:
+    """
+    Fans Redis pub/sub notifications out to the open streams of this process.
+    All users share one Redis connection: a channel is subscribed while at least
+    one of its user's streams is open, and each stream gets its own small queue.
+    """
+    def __init__(self):
+        self.redis = None
+        self.pubsub = None
+        self.reader = None
+        self.listeners = {} # user_id -> set of asyncio.Queue
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+        async with self.lock:
+            if self.pubsub is None:
+                self.redis = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
+                self.pubsub = self.redis.pubsub()
+            if user_id not in self.listeners:
+                self.listeners[user_id] = set()
+                await self.pubsub.subscribe(NotificationService.channel(user_id))
+            self.listeners[user_id].add(queue)
+            if self.reader is None or self.reader.done():
+                self.reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        async with self.lock:
+            queues = self.listeners.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if not queues:
+                del self.listeners[user_id]
+                await self.pubsub.unsubscribe(NotificationService.channel(user_id))
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception as e:
+                print(f"Notification broker read failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not message:
+                continue
+            user_id = int(message["channel"].split(":")[1])
+            for queue in list(self.listeners.get(user_id, ())):
+                if queue.full():
+                    # Slow client: drop its oldest event rather than block the others
+                    queue.get_nowait()
+                queue.put_nowait(message["data"])
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        if self.pubsub:
+            await self.pubsub.aclose()
+            await self.redis.aclose()
+        self.redis = self.pubsub = self.reader = None
+        self.listeners = {}
+
+notification_broker = NotificationBroker()
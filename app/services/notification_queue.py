@@ -0,0 +1,204 @@
+from app.core.redis_db import redis_client
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import postgresql as models
+from app.services.notification_service import NotificationService
+from typing import List, Optional
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+
+STREAM_KEY = "notifications:jobs"
+GROUP_NAME = "notification-workers"
+DEAD_LETTER_KEY = "notifications:jobs:dead"
+ATTEMPTS_KEY = "notifications:jobs:attempts"
+DONE_KEY_PREFIX = "notifications:jobs:done:"
+DONE_TTL_SECONDS = 7 * 86400
+
+def process_job(job: dict):
+    """Delivers one fan-out job: resolves recipients and stores the notifications in bulk."""
+    db = SessionLocal()
+    try:
+        user_ids = job.get("user_ids")
+        if user_ids is None:
+            user_ids = [row.user_id for row in db.query(models.CourseEnrollment.user_id).filter(
+                models.CourseEnrollment.course_id == job["course_id"]
+            )]
+        # Idempotent, so a retry after a partial failure does not duplicate notifications
+        NotificationService.create_notifications_bulk(
+            db, user_ids, job["type"], job["reference_id"], job["message"], job.get("metadata"),
+            idempotency_key=job["idempotency_key"]
+        )
+    finally:
+        db.close()
+
+class NotificationQueue:
+    """
+    Hands notification fan-out to a worker so requests return once their own write is committed.
+    In "redis" mode jobs go to a Redis Stream consumed by NotificationWorker processes; in
+    "local" mode they are delivered by a thread in this process (no extra services needed).
+    """
+    _local_queue = None
+    _local_thread = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enqueue(type: str, reference_id: int, message: str, metadata: dict = None,
+                user_ids: Optional[List[int]] = None, course_id: Optional[int] = None):
+        """Queues a notification for user_ids, or for every student enrolled in course_id."""
+        job = {
+            "idempotency_key": str(uuid.uuid4()),
+            "type": type,
+            "reference_id": reference_id,
+            "message": message,
+            "metadata": metadata or {},
+            "user_ids": user_ids,
+            "course_id": course_id
+        }
+        if settings.NOTIFICATION_QUEUE_MODE == "local":
+            NotificationQueue._start_local_dispatcher()
+            NotificationQueue._local_queue.put(job)
+        else:
+            redis_client.xadd(
+                STREAM_KEY, {"job": json.dumps(job)},
+                maxlen=settings.NOTIFICATION_STREAM_MAXLEN, approximate=True
+            )
+        return job["idempotency_key"]
+
+    @staticmethod
+    def drain(timeout: float = None):
+        """Blocks until the local dispatcher has handled every queued job (local mode)."""
+        if NotificationQueue._local_queue is None:
+            return
+        deadline = time.monotonic() + timeout if timeout else None
+        while NotificationQueue._local_queue.unfinished_tasks:
+            if deadline and time.monotonic() > deadline:
+                return
+            time.sleep(0.01)
+
+    @staticmethod
+    def _start_local_dispatcher():
+        with NotificationQueue._lock:
+            if NotificationQueue._local_thread is None:
+                NotificationQueue._local_queue = queue.Queue()
+                NotificationQueue._local_thread = threading.Thread(
+                    target=NotificationQueue._run_local, name="notification-dispatcher", daemon=True
+                )
+                NotificationQueue._local_thread.start()
+
+    @staticmethod
+    def _run_local():
+        # Jobs are never redelivered locally, and retries are safe (see process_job)
+        jobs = NotificationQueue._local_queue
+        while True:
+            job = jobs.get()
+            try:
+                for attempt in range(1, settings.NOTIFICATION_MAX_ATTEMPTS + 1):
+                    try:
+                        process_job(job)
+                        break
+                    except Exception as e:
+                        print(f"Notification job {job['idempotency_key']} failed (attempt {attempt}): {e}")
+                        if attempt == settings.NOTIFICATION_MAX_ATTEMPTS:
+                            NotificationQueue._dead_letter(job, e)
+                        else:
+                            time.sleep(min(2 ** attempt * 0.1, 5))
+            finally:
+                jobs.task_done()
+
+    @staticmethod
+    def _dead_letter(job: dict, error: Exception):
+        """Keeps a job that exhausted its attempts in the same dead-letter stream NotificationWorker uses."""
+        try:
+            redis_client.xadd(DEAD_LETTER_KEY, {"job": json.dumps(job), "error": str(error)})
+        except Exception as e:
+            print(f"Failed to dead-letter notification job {job['idempotency_key']}: {e}")
+
+class NotificationWorker:
+    """
+    Redis Stream consumer. Any number of workers can join the consumer group; each job is
+    acknowledged after delivery, retried by reclaiming it once it has been pending for
+    NOTIFICATION_RETRY_IDLE_MS, and moved to a dead-letter stream after
+    NOTIFICATION_MAX_ATTEMPTS failures. Idempotency keys make redelivery harmless.
+    """
+    def __init__(self, consumer_name: str = None, batch_size: int = 10, block_ms: int = 2000):
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.stop_event = threading.Event()
+
+    def ensure_group(self):
+        try:
+            redis_client.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def run(self):
+        self.ensure_group()
+        last_reclaim = 0.0
+        while not self.stop_event.is_set():
+            try:
+                # Pick up jobs whose consumer failed or crashed before acknowledging them
+                if time.monotonic() - last_reclaim > settings.NOTIFICATION_RETRY_IDLE_MS / 1000:
+                    last_reclaim = time.monotonic()
+                    _, claimed, *_ = redis_client.xautoclaim(
+                        STREAM_KEY, GROUP_NAME, self.consumer_name,
+                        min_idle_time=settings.NOTIFICATION_RETRY_IDLE_MS, start_id="0-0", count=self.batch_size
+                    )
+                    for message_id, fields in claimed:
+                        self.handle(message_id, fields)
+
+                response = redis_client.xreadgroup(
+                    GROUP_NAME, self.consumer_name, {STREAM_KEY: ">"},
+                    count=self.batch_size, block=self.block_ms
+                )
+                for _, messages in response or []:
+                    for message_id, fields in messages:
+                        self.handle(message_id, fields)
+            except Exception as e:
+                if "NOGROUP" in str(e):
+                    # Stream or group removed (e.g. Redis flushed); recreate and carry on
+                    self.ensure_group()
+                    continue
+                print(f"Notification worker {self.consumer_name} error: {e}")
+                self.stop_event.wait(1)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def handle(self, message_id: str, fields: dict):
+        if not fields:
+            # Trimmed from the stream while pending
+            redis_client.xack(STREAM_KEY, GROUP_NAME, message_id)
+            return
+
+        job = json.loads(fields["job"])
+        done_key = DONE_KEY_PREFIX + job["idempotency_key"]
+        if redis_client.exists(done_key):
+            redis_client.xack(STREAM_KEY, GROUP_NAME, message_id)
+            return
+
+        try:
+            process_job(job)
+        except Exception as e:
+            attempts = redis_client.hincrby(ATTEMPTS_KEY, message_id, 1)
+            print(f"Notification job {message_id} failed (attempt {attempts}): {e}")
+            if attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                pipe = redis_client.pipeline()
+                pipe.xadd(DEAD_LETTER_KEY, {"job": fields["job"], "error": str(e)})
+                pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+                pipe.hdel(ATTEMPTS_KEY, message_id)
+                pipe.execute()
+            # Otherwise left pending; it is reclaimed after NOTIFICATION_RETRY_IDLE_MS
+            return
+
+        pipe = redis_client.pipeline()
+        pipe.set(done_key, "1", ex=DONE_TTL_SECONDS)
+        pipe.xack(STREAM_KEY, GROUP_NAME, message_id)
+        pipe.hdel(ATTEMPTS_KEY, message_id)
+        pipe.execute()
@@ -1,82 +1,248 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import insert
 from app.models import postgresql as models
 from app.core.redis_db import redis_client
-from app.core.cassandra_db import get_cassandra_session
+from app.core.cassandra_db import get_cassandra_session, get_statement
+from app.core.config import settings
+from cassandra.concurrent import execute_concurrent_with_args
+from typing import List
 import uuid
 import json
+import hashlib
+import hmac
+import re
 from datetime import datetime
 
+def history_month(dt: datetime) -> str:
+    return dt.strftime("%Y-%m")
+
+def history_id(notification_id: int) -> uuid.UUID:
+    """Stable history row ID of a notification."""
+    return uuid.uuid5(uuid.NAMESPACE_OID, f"notification:{notification_id}")
+
+def _cursor_signature(user_id: int, month: str, state: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"{user_id}:{month}:{state}".encode(), hashlib.sha256).hexdigest()[:32]
+
+def encode_history_cursor(user_id: int, month: str, paging_state: bytes = None) -> str:
+    state = paging_state.hex() if paging_state else ""
+    return f"{month}:{state}:{_cursor_signature(user_id, month, state)}"
+
+def decode_history_cursor(user_id: int, cursor: str):
+    """
+    Returns (month, paging_state) from a history cursor. The cursor is signed, so a paging state
+    Cassandra would reject never reaches it; raises ValueError for a malformed or tampered cursor.
+    """
+    month, _, rest = cursor.partition(":")
+    state, _, signature = rest.partition(":")
+    if not re.fullmatch(r"\d{4}-\d{2}", month) or not re.fullmatch(r"[0-9a-f]*", state):
+        raise ValueError("Malformed cursor")
+    if not hmac.compare_digest(signature, _cursor_signature(user_id, month, state)):
+        raise ValueError("Invalid cursor signature")
+    return month, bytes.fromhex(state) if state else None
+
+def previous_month(month: str) -> str:
+    year, mon = map(int, month.split("-"))
+    return f"{year - 1}-12" if mon == 1 else f"{year}-{mon - 1:02d}"
+
+# KEYS: ids zset, data hash. ARGV: cache size, id, payload. Keeps only the newest entries.
+ADD_UNREAD = redis_client.register_script("""
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[1])
+if excess > 0 then
+    local evicted = redis.call('ZRANGE', KEYS[1], 0, excess - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, excess - 1)
+    redis.call('HDEL', KEYS[2], unpack(evicted))
+end
+return 1
+""")
+
+# KEYS: ids zset, data hash. ARGV: notification IDs. Returns the remaining unread count.
+MARK_READ = redis_client.register_script("""
+redis.call('ZREM', KEYS[1], unpack(ARGV))
+redis.call('HDEL', KEYS[2], unpack(ARGV))
+return redis.call('ZCARD', KEYS[1])
+""")
+
+# KEYS: ids zset, data hash. ARGV: max score (exclusive cursor or +inf), limit. Returns {ids, payloads}.
+PAGE_UNREAD = redis_client.register_script("""
+local ids = redis.call('ZREVRANGEBYSCORE', KEYS[1], ARGV[1], '-inf', 'LIMIT', 0, ARGV[2])
+if #ids == 0 then
+    return {{}, {}}
+end
+return {ids, redis.call('HMGET', KEYS[2], unpack(ids))}
+""")
+
 class NotificationService:
     @staticmethod
     def create_notification(db: Session, user_id: int, type: str, reference_id: int, message: str, metadata: dict = None):
-        # 1. Store in PostgreSQL
-        db_notif = models.Notification(
-            user_id=user_id,
-            type=type,
-            reference_id=reference_id,
-            is_read=False
+        return NotificationService.create_notifications_bulk(db, [user_id], type, reference_id, message, metadata)[0]
+
+    @staticmethod
+    def create_notifications_bulk(db: Session, user_ids: List[int], type: str, reference_id: int, message: str,
+                                  metadata: dict = None, idempotency_key: str = None):
+        """
+        Fans the same notification out to many users with one round-trip per store. With an
+        idempotency_key a retry is safe: users who already have the notification keep their
+        row (and its ID and timestamp), only newly inserted rows are added to the unread set and
+        pushed, and the Cassandra writes are upserts.
+        """
+        if not user_ids:
+            return []
+        now = datetime.utcnow()
+
+        # 1. Store in PostgreSQL (single multi-row INSERT ... RETURNING, existing rows included)
+        statement = insert(models.Notification).values([
+            {"user_id": user_id, "type": type, "reference_id": reference_id, "is_read": False,
+             "timestamp": now, "idempotency_key": idempotency_key}
+            for user_id in user_ids
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=["idempotency_key", "user_id"],
+            set_={"idempotency_key": statement.excluded.idempotency_key}
         )
-        db.add(db_notif)
+        rows = db.execute(statement.returning(
+            models.Notification.id, models.Notification.user_id, models.Notification.timestamp,
+            # xmax is 0 only for rows this statement inserted, not for the ones it found
+            literal_column("xmax = 0").label("inserted")
+        )).all()
         db.commit()
-        db.refresh(db_notif)
-        
-        # 2. Store in Redis (List for unread)
-        notif_data = {
-            "id": db_notif.id,
+
+        notifications = [{
+            "id": row.id,
+            "user_id": row.user_id,
             "type": type,
             "reference_id": reference_id,
             "message": message,
-            "timestamp": str(db_notif.timestamp),
+            "timestamp": str(row.timestamp),
             "metadata": metadata or {}
-        }
-        redis_client.lpush(f"user:{user_id}:notifications", json.dumps(notif_data))
-        # Optional: trim list
-        redis_client.ltrim(f"user:{user_id}:notifications", 0, 49)
-        
-        # 3. Store in Cassandra (History)
+        } for row in rows]
+
+        # 2. Store in Redis (unread index + payloads), pipelined. A retried job skips the rows an
+        # earlier attempt inserted: the user may have read them already, and was pushed them once.
+        pipe = redis_client.pipeline(transaction=False)
+        for notif, row in zip(notifications, rows):
+            if not row.inserted:
+                continue
+            notif_data = {k: v for k, v in notif.items() if k != "user_id"}
+            payload = json.dumps(notif_data)
+            ADD_UNREAD(
+                keys=NotificationService._unread_keys(notif["user_id"]),
+                args=[settings.NOTIFICATION_UNREAD_CACHE_SIZE, notif["id"], payload],
+                client=pipe
+            )
+            # Live push to any open notification streams of this user
+            pipe.publish(NotificationService.channel(notif["user_id"]), payload)
+        pipe.execute()
+
+        # 3. Store in Cassandra (History), executed concurrently
         try:
             cassandra_session = get_cassandra_session()
             if cassandra_session:
-                query = """
-                    INSERT INTO notification_history (user_id, notification_id, type, reference_id, message, is_read, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
-                cassandra_session.execute(query, (
-                    user_id, uuid.uuid4(), type, reference_id, message, False, datetime.utcnow()
-                ))
+                statement = get_statement("insert_notification_history")
+                # Keyed by the PostgreSQL row, so a retried job overwrites rather than duplicates
+                params = [
+                    (row.user_id, history_month(row.timestamp), row.timestamp, history_id(row.id), type, reference_id, message, False)
+                    for row in rows
+                ]
+                results = execute_concurrent_with_args(cassandra_session, statement, params, concurrency=50, raise_on_first_error=False)
+                failures = [result for success, result in results if not success]
+                if failures:
+                    print(f"Failed to store {len(failures)} notification history rows in Cassandra: {failures[0]}")
         except Exception as e:
             print(f"Failed to store notification history in Cassandra: {e}")
-        
-        return db_notif
+
+        return notifications
+
+    @staticmethod
+    def channel(user_id: int):
+        return f"user:{user_id}:notifications:channel"
 
     @staticmethod
-    def get_unread_notifications(user_id: int):
-        notifs = redis_client.lrange(f"user:{user_id}:notifications", 0, -1)
-        return [json.loads(n) for n in notifs]
+    def _unread_keys(user_id: int):
+        # Sorted set of unread IDs (score = ID, so newest first) + hash of ID -> payload
+        return [f"user:{user_id}:notifications:ids", f"user:{user_id}:notifications:data"]
+
+    @staticmethod
+    def get_unread_notifications(user_id: int, cursor: int = None, limit: int = None):
+        """Returns (notifications, next_cursor), newest first; pass next_cursor back to get older ones."""
+        limit = limit or settings.NOTIFICATION_UNREAD_CACHE_SIZE
+        max_score = f"({cursor}" if cursor else "+inf"
+        ids, payloads = PAGE_UNREAD(keys=NotificationService._unread_keys(user_id), args=[max_score, limit])
+        notifs = [json.loads(p) for p in payloads if p]
+        next_cursor = int(ids[-1]) if len(ids) == limit else None
+        return notifs, next_cursor
+
+    @staticmethod
+    def get_unread_count(user_id: int):
+        return redis_client.zcard(NotificationService._unread_keys(user_id)[0])
 
     @staticmethod
     def mark_as_read(db: Session, user_id: int, notification_id: int):
+        return NotificationService.mark_many_as_read(db, user_id, [notification_id])
+
+    @staticmethod
+    def mark_many_as_read(db: Session, user_id: int, notification_ids: List[int]):
+        """Marks notifications read; returns the remaining unread count."""
+        if not notification_ids:
+            return NotificationService.get_unread_count(user_id)
+
         # 1. Update DB
-        db_notif = db.query(models.Notification).filter(
-            models.Notification.id == notification_id,
+        db.query(models.Notification).filter(
+            models.Notification.id.in_(notification_ids),
             models.Notification.user_id == user_id
-        ).first()
-        
-        if db_notif:
-            db_notif.is_read = True
-            db.commit()
-            
-            # 2. Update Redis: Filter out the read notification
-            redis_key = f"user:{user_id}:notifications"
-            current_notifs = redis_client.lrange(redis_key, 0, -1)
-            redis_client.delete(redis_key)
-            
-            for n_str in current_notifs:
-                try:
-                    n_json = json.loads(n_str)
-                    if n_json.get("id") != notification_id:
-                        redis_client.rpush(redis_key, n_str)
-                except:
-                    continue
-                    
-        return True
+        ).update({"is_read": True}, synchronize_session=False)
+        db.commit()
+
+        # 2. Update Redis atomically
+        return MARK_READ(keys=NotificationService._unread_keys(user_id), args=notification_ids)
+
+    @staticmethod
+    def clear_all(db: Session, user_id: int):
+        db.query(models.Notification).filter(
+            models.Notification.user_id == user_id,
+            models.Notification.is_read == False
+        ).update({"is_read": True}, synchronize_session=False)
+        db.commit()
+        # Also drop the list used before the sorted set/hash layout
+        redis_client.delete(*NotificationService._unread_keys(user_id), f"user:{user_id}:notifications")
+
+    @staticmethod
+    def get_history(user_id: int, cursor: str = None, limit: int = 20):
+        """
+        Returns (notifications, next_cursor), newest first, from the month-bucketed Cassandra history.
+        The cursor is "<month>:<paging state hex>:<signature>" and is opaque to clients. History rows are
+        write-once, so read state is not included; the unread API is authoritative for it.
+        """
+        now = datetime.utcnow()
+        oldest = history_month(now)
+        for _ in range(settings.NOTIFICATION_HISTORY_MONTHS - 1):
+            oldest = previous_month(oldest)
+
+        if cursor:
+            month, paging_state = decode_history_cursor(user_id, cursor)
+        else:
+            month, paging_state = history_month(now), None
+
+        cassandra_session = get_cassandra_session()
+        statement = get_statement("select_notification_history")
+        items = []
+        while len(items) < limit and month >= oldest:
+            bound = statement.bind((user_id, month))
+            bound.fetch_size = limit - len(items)
+            result = cassandra_session.execute(bound, paging_state=paging_state)
+            items.extend({
+                "id": str(row.notification_id),
+                "type": row.type,
+                "reference_id": row.reference_id,
+                "message": row.message,
+                "timestamp": str(row.created_at)
+            } for row in result.current_rows)
+            paging_state = result.paging_state
+            if paging_state is None:
+                month = previous_month(month)
+
+        if month < oldest:
+            return items, None
+        return items, encode_history_cursor(user_id, month, paging_state)
@@ -0,0 +1,91 @@
+from app.core.redis_db import redis_client
+from app.core.config import settings
+from app.services.user_cache import UserCache
+import secrets
+
+class SessionStore:
+    """
+    Login sessions in Redis. Each session is sess:{sid} (value: user ID) where sid is a short
+    random ID carried in the JWT "sid" claim, and user:{id}:sessions indexes a user's sessions
+    so they can be listed or revoked without scanning the keyspace.
+    Sessions expire after ACCESS_TOKEN_EXPIRE_MINUTES of inactivity; the TTL is pushed back at
+    most once every SESSION_REFRESH_SECONDS rather than on every request.
+    """
+
+    @staticmethod
+    def _key(sid: str):
+        return f"sess:{sid}"
+
+    @staticmethod
+    def _user_key(user_id: int):
+        return f"user:{user_id}:sessions"
+
+    @staticmethod
+    def create(user_id: int) -> str:
+        sid = secrets.token_urlsafe(12)
+        pipe = redis_client.pipeline()
+        pipe.set(SessionStore._key(sid), str(user_id), ex=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+        pipe.sadd(SessionStore._user_key(user_id), sid)
+        pipe.expire(SessionStore._user_key(user_id), settings.SESSION_MAX_AGE_HOURS * 3600)
+        pipe.execute()
+        return sid
+
+    @staticmethod
+    def lookup(sid: str, user_id: int):
+        """
+        Checks the session and reads the cached user in one round-trip.
+        Returns (valid, cached user data or None).
+        """
+        key = SessionStore._key(sid)
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        entry = UserCache.queue_lookup(pipe, user_id)
+        owner, ttl, cached = pipe.execute()
+
+        if owner != str(user_id):
+            return False, None
+
+        # Sliding expiry, written only once the TTL has dropped by SESSION_REFRESH_SECONDS
+        idle_ttl = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        if 0 <= ttl < idle_ttl - settings.SESSION_REFRESH_SECONDS:
+            redis_client.expire(key, idle_ttl)
+
+        return True, UserCache.resolve(user_id, entry, cached)
+
+    @staticmethod
+    def is_active(sid: str, user_id: int) -> bool:
+        """Whether the session still exists, without extending it (for long-lived connections)."""
+        return redis_client.get(SessionStore._key(sid)) == str(user_id)
+
+    @staticmethod
+    def list(user_id: int):
+        """Returns the user's live sessions; index entries of expired sessions are pruned."""
+        sids = list(redis_client.smembers(SessionStore._user_key(user_id)))
+        pipe = redis_client.pipeline(transaction=False)
+        for sid in sids:
+            pipe.ttl(SessionStore._key(sid))
+        ttls = pipe.execute() if sids else []
+
+        expired = [sid for sid, ttl in zip(sids, ttls) if ttl == -2]
+        if expired:
+            redis_client.srem(SessionStore._user_key(user_id), *expired)
+        return [{"session_id": sid, "expires_in": ttl} for sid, ttl in zip(sids, ttls) if ttl != -2]
+
+    @staticmethod
+    def revoke(user_id: int, sid: str):
+        pipe = redis_client.pipeline()
+        pipe.delete(SessionStore._key(sid))
+        pipe.srem(SessionStore._user_key(user_id), sid)
+        pipe.execute()
+
+    @staticmethod
+    def revoke_all(user_id: int, except_sid: str = None) -> int:
+        """Ends every session of the user (optionally keeping one); returns how many were revoked."""
+        sids = [sid for sid in redis_client.smembers(SessionStore._user_key(user_id)) if sid != except_sid]
+        if not sids:
+            return 0
+        pipe = redis_client.pipeline()
+        pipe.delete(*[SessionStore._key(sid) for sid in sids])
+        pipe.srem(SessionStore._user_key(user_id), *sids)
+        return pipe.execute()[0]
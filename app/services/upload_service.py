@@ -0,0 +1,292 @@
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, select, func
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from app.core import minio_client
+from app.core.config import settings
+from app.models import postgresql as models
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from datetime import timedelta
+import asyncio
+import functools
+import hashlib
+import uuid
+
+MB = 1024 * 1024
+HASH_CHUNK_SIZE = MB
+BLOB_PREFIX = "blobs/"
+BLOB_STORE_ATTEMPTS = 3
+
+# Shared by all requests, so it also bounds concurrent uploads per process
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.UPLOAD_WORKERS,
+    thread_name_prefix="minio-upload"
+)
+
+async def _run(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_upload_executor, functools.partial(fn, *args, **kwargs))
+
+def blob_key(content_hash: str) -> str:
+    return f"{BLOB_PREFIX}{content_hash}"
+
+def _blob_models(bucket: str):
+    # Attachment tables whose rows reference blobs in bucket
+    if bucket == settings.MINIO_BUCKET_SUBMISSIONS:
+        return [models.SubmissionAttachment]
+    return [models.PostAttachment, models.AssignmentAttachment]
+
+def _remove_objects(bucket: str, object_names: List[str]):
+    try:
+        errors = minio_client.get_minio_client().remove_objects(bucket, [DeleteObject(name) for name in object_names])
+        for error in errors:
+            print(f"Failed to remove {error.name} from MinIO: {error.message}")
+    except Exception as e:
+        print(f"Failed to remove objects from MinIO: {e}")
+
+def _blob_exists(bucket: str, content_hash: str) -> bool:
+    try:
+        minio_client.get_minio_client().stat_object(bucket, blob_key(content_hash))
+        return True
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+        return False
+
+class UploadTooLarge(Exception):
+    pass
+
+class _LimitedReader:
+    """File-like wrapper over an upload spool that counts bytes and stops past the limit."""
+    def __init__(self, file, max_bytes: int):
+        self.file = file
+        self.max_bytes = max_bytes
+        self.read_bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.file.read(size)
+        self.read_bytes += len(chunk)
+        if self.read_bytes > self.max_bytes:
+            raise UploadTooLarge()
+        return chunk
+
+class UploadService:
+    """
+    Streams UploadFile spools into MinIO. Objects are sent as multipart uploads of
+    UPLOAD_PART_SIZE_MB parts read one at a time, so an upload never holds more than a
+    part or two in memory, and the blocking MinIO calls run on a bounded upload pool.
+    Attachments are stored once per bucket as blobs/<sha256>, shared by every attachment
+    row with that content_hash. Rows get their own URL (blobs/<random token>_<filename>),
+    which is mapped to the blob when served, so a URL cannot be derived from file contents.
+    """
+
+    @staticmethod
+    def check_sizes(files: Optional[List[UploadFile]], max_bytes: int = None):
+        """Rejects oversized files up front, before any database or storage work."""
+        max_bytes = max_bytes or settings.UPLOAD_MAX_FILE_MB * MB
+        for file in files or []:
+            if file.filename and file.size is not None and file.size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{file.filename} exceeds the {max_bytes // MB} MB upload limit"
+                )
+
+    @staticmethod
+    async def upload(file: UploadFile, bucket: str, object_name: str, max_bytes: int = None) -> int:
+        """Uploads file to bucket/object_name and returns its size in bytes."""
+        max_bytes = max_bytes or settings.UPLOAD_MAX_FILE_MB * MB
+        UploadService.check_sizes([file], max_bytes)
+        await file.seek(0)
+        reader = _LimitedReader(file.file, max_bytes)
+        try:
+            # MinIO reads part by part and aborts the multipart upload on error. The size is known
+            # once the multipart form is parsed; -1 (unknown) costs an extra copy of each part.
+            await _run(
+                minio_client.get_minio_client().put_object,
+                bucket, object_name,
+                data=reader,
+                length=file.size if file.size is not None else -1,
+                part_size=settings.UPLOAD_PART_SIZE_MB * MB,
+                content_type=file.content_type or "application/octet-stream",
+                num_parallel_uploads=1
+            )
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{file.filename} exceeds the {max_bytes // MB} MB upload limit"
+            )
+        return reader.read_bytes
+
+    @staticmethod
+    async def content_hash(file: UploadFile, max_bytes: int = None, scope: str = None) -> str:
+        """
+        SHA-256 of the upload spool, read locally before anything is sent to MinIO. With a
+        scope the hash is salted, so identical files only share a blob within that scope.
+        """
+        max_bytes = max_bytes or settings.UPLOAD_MAX_FILE_MB * MB
+
+        def digest():
+            file.file.seek(0)
+            reader = _LimitedReader(file.file, max_bytes)
+            sha256 = hashlib.sha256(f"{scope}\0".encode() if scope else b"")
+            while chunk := reader.read(HASH_CHUNK_SIZE):
+                sha256.update(chunk)
+            return sha256.hexdigest()
+
+        try:
+            return await _run(digest)
+        except UploadTooLarge:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{file.filename} exceeds the {max_bytes // MB} MB upload limit"
+            )
+
+    @staticmethod
+    async def store_blob(file: UploadFile, bucket: str, content_hash: str) -> bool:
+        """Uploads file as blobs/<content_hash> unless that blob exists; returns whether it was uploaded."""
+        if await _run(_blob_exists, bucket, content_hash):
+            return False
+        await UploadService.upload(file, bucket, blob_key(content_hash))
+        return True
+
+    @staticmethod
+    async def store_blobs(files_by_hash: dict, bucket: str, created: List[str]):
+        """
+        Stores the distinct blobs concurrently, appending the hashes actually uploaded to
+        created (also when another upload fails, so the caller can clean them up).
+        """
+        hashes = list(files_by_hash)
+        results = await asyncio.gather(
+            *(UploadService.store_blob(files_by_hash[h], bucket, h) for h in hashes),
+            return_exceptions=True
+        )
+        created.extend(h for h, result in zip(hashes, results) if result is True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def lock_blobs(db: Session, hashes):
+        """
+        Takes transaction-level advisory locks on the blobs, in a fixed order, so storing a
+        blob and collecting it never interleave. Released by the next commit or rollback.
+        Blocks, so it must not run on the event loop.
+        """
+        for content_hash in sorted(set(hashes)):
+            db.execute(select(func.pg_advisory_xact_lock(int(content_hash[:15], 16))))
+
+    @staticmethod
+    def _insert_blob_rows(db: Session, bucket: str, model, rows: List[dict]) -> List[str]:
+        """
+        Inserts rows under their blobs' locks once every blob is confirmed present. Returns
+        the hashes collected since they were stored (nothing is inserted then).
+        """
+        hashes = sorted({row["content_hash"] for row in rows})
+        try:
+            UploadService.lock_blobs(db, hashes)
+            missing = [h for h in hashes if not _blob_exists(bucket, h)]
+            if missing:
+                db.rollback()
+                return missing
+            db.execute(insert(model), rows)
+            db.commit()
+            return []
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    async def save_attachments(db: Session, files: Optional[List[UploadFile]], bucket: str,
+                               model, url_prefix: str, dedupe_scope: str = None, **parent):
+        """
+        Stores files as content-addressed blobs and inserts their attachment rows (model, linked
+        by parent) in one statement. Content already in the bucket is not uploaded again; pass
+        dedupe_scope (e.g. the uploading user) to only share blobs within that scope.
+        Uploads run without any lock or open transaction; the blobs are only locked for the
+        short existence check and insert, and uploaded blobs are released if that fails.
+        """
+        files = [file for file in files or [] if file.filename]
+        if not files:
+            return
+        UploadService.check_sizes(files)
+        hashes = await asyncio.gather(*(UploadService.content_hash(file, scope=dedupe_scope) for file in files))
+        files_by_hash = dict(zip(hashes, files))
+        rows = [
+            {
+                **parent,
+                "file_url": f"{url_prefix}/{BLOB_PREFIX}{uuid.uuid4().hex}_{file.filename}",
+                "filename": file.filename,
+                "content_hash": content_hash
+            }
+            for content_hash, file in zip(hashes, files)
+        ]
+
+        created = []
+        try:
+            pending = list(files_by_hash)
+            for _ in range(BLOB_STORE_ATTEMPTS):
+                await UploadService.store_blobs({h: files_by_hash[h] for h in pending}, bucket, created)
+                # Blobs collected by a concurrent delete in the meantime are stored again
+                pending = await run_in_threadpool(UploadService._insert_blob_rows, db, bucket, model, rows)
+                if not pending:
+                    return
+            raise RuntimeError("Attachment blobs were collected while being attached")
+        except Exception:
+            # Another request may reference the same blobs by now, so only unreferenced ones go
+            await run_in_threadpool(UploadService.release_blobs, db, bucket, created)
+            raise
+
+    @staticmethod
+    def resolve_blob(db: Session, bucket: str, file_url: str) -> Optional[str]:
+        """Content hash of the blob behind an attachment URL, or None if no attachment has that URL."""
+        for model in _blob_models(bucket):
+            row = db.query(model.content_hash).filter(model.file_url == file_url).first()
+            if row:
+                return row.content_hash
+        return None
+
+    @staticmethod
+    def release_blobs(db: Session, bucket: str, hashes):
+        """
+        Drops blobs no attachment row references any more. Call once the rows dropping the
+        references are committed; references are counted from the attachment tables themselves.
+        Blocks on the blob locks, so async callers run it with run_in_threadpool.
+        """
+        hashes = sorted({h for h in hashes if h})
+        if not hashes:
+            return
+        try:
+            UploadService.lock_blobs(db, hashes)
+            referenced = set()
+            for model in _blob_models(bucket):
+                referenced.update(
+                    h for (h,) in db.query(model.content_hash).filter(model.content_hash.in_(hashes)).distinct()
+                )
+            unreferenced = [blob_key(h) for h in hashes if h not in referenced]
+            if unreferenced:
+                _remove_objects(bucket, unreferenced)
+        finally:
+            db.commit()
+
+    @staticmethod
+    def object_name(prefix: str, filename: str) -> str:
+        return f"{prefix}/{uuid.uuid4()}_{filename}"
+
+    @staticmethod
+    def presign_put(bucket: str, object_name: str) -> str:
+        """Short-lived URL the client PUTs the file to directly."""
+        return minio_client.get_presign_client().presigned_put_object(
+            bucket, object_name, expires=timedelta(seconds=settings.PRESIGNED_URL_EXPIRE_SECONDS)
+        )
+
+    @staticmethod
+    def presign_get(bucket: str, object_name: str, filename: str, download: bool = False) -> str:
+        """Short-lived download URL; MinIO sets Content-Disposition from the signed parameters."""
+        disposition = "attachment" if download else "inline"
+        return minio_client.get_presign_client().presigned_get_object(
+            bucket, object_name,
+            expires=timedelta(seconds=settings.PRESIGNED_URL_EXPIRE_SECONDS),
+            response_headers={"response-content-disposition": f'{disposition}; filename="{filename}"'}
+        )
@@ -0,0 +1,105 @@
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.models import postgresql as models
+from app.core.redis_db import redis_client
+from app.core.config import settings
+from collections import OrderedDict
+import json
+import threading
+import time
+import uuid
+
+# Credentials never leave PostgreSQL; endpoints that check them load them explicitly
+CREDENTIAL_COLUMNS = {"hashed_password"}
+USER_COLUMNS = [column.name for column in models.User.__table__.columns if column.name not in CREDENTIAL_COLUMNS]
+
+class UserCache:
+    """
+    Two-tier cache of User rows for request authentication.
+    Redis holds user:{id}:cache, a hash with the serialized row ("data") and a version ("v")
+    that changes whenever it is rebuilt. Each process keeps a small LRU of recent users with a
+    TTL; a local entry is only used while its version still matches Redis, which is checked
+    in the same pipeline as the session lookup, so invalidation is immediate everywhere.
+    """
+    _local = OrderedDict() # user_id -> (expires_at, version, data)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: int):
+        return f"user:{user_id}:cache"
+
+    @staticmethod
+    def queue_lookup(pipe, user_id: int):
+        """
+        Adds the cache read for user_id to pipe, so it shares a round-trip with the session check.
+        Returns the local entry to pass to resolve() with the command's result.
+        """
+        with UserCache._lock:
+            entry = UserCache._local.get(user_id)
+            if entry and entry[0] < time.monotonic():
+                del UserCache._local[user_id]
+                entry = None
+
+        if entry:
+            pipe.hget(UserCache._key(user_id), "v")
+        else:
+            pipe.hgetall(UserCache._key(user_id))
+        return entry
+
+    @staticmethod
+    def resolve(user_id: int, entry, cached):
+        """Returns the cached user data, or None when the user must be loaded from PostgreSQL."""
+        if entry:
+            if cached == entry[1]:
+                with UserCache._lock:
+                    if user_id in UserCache._local:
+                        UserCache._local.move_to_end(user_id)
+                return entry[2]
+            # Invalidated or rebuilt by another process
+            UserCache._forget(user_id)
+            return None
+
+        if not cached:
+            return None
+        data = json.loads(cached["data"])
+        UserCache._remember(user_id, cached["v"], data)
+        return data
+
+    @staticmethod
+    def attach(db: Session, data: dict) -> models.User:
+        """
+        Rebuilds a persistent User from cached data without querying PostgreSQL. Credential
+        columns are left unloaded (accessing one queries the database).
+        """
+        user = models.User(**{column: data[column] for column in USER_COLUMNS if column in data})
+        make_transient_to_detached(user)
+        db.add(user)
+        return user
+
+    @staticmethod
+    def store(user: models.User):
+        data = {column: getattr(user, column) for column in USER_COLUMNS}
+        version = uuid.uuid4().hex[:12]
+        key = UserCache._key(user.id)
+        pipe = redis_client.pipeline()
+        pipe.hset(key, mapping={"v": version, "data": json.dumps(data)})
+        pipe.expire(key, settings.USER_CACHE_TTL_SECONDS)
+        pipe.execute()
+        UserCache._remember(user.id, version, data)
+
+    @staticmethod
+    def invalidate(user_id: int):
+        redis_client.delete(UserCache._key(user_id))
+        UserCache._forget(user_id)
+
+    @staticmethod
+    def _remember(user_id: int, version: str, data: dict):
+        with UserCache._lock:
+            UserCache._local[user_id] = (time.monotonic() + settings.USER_CACHE_LOCAL_TTL_SECONDS, version, data)
+            UserCache._local.move_to_end(user_id)
+            while len(UserCache._local) > settings.USER_CACHE_LOCAL_SIZE:
+                UserCache._local.popitem(last=False)
+
+    @staticmethod
+    def _forget(user_id: int):
+        with UserCache._lock:
+            UserCache._local.pop(user_id, None)
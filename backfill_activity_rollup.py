@@ -0,0 +1,25 @@
+import sys
+import os
+import argparse
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.core.database import engine, SessionLocal
+from app.models.postgresql import Base
+from app.services.analytics_service import AnalyticsService
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the course_daily_activity rollup from existing posts, comments and submissions.")
+    parser.add_argument("--course-id", type=int, default=None, help="Only rebuild this course (default: all courses)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        scope = f"course {args.course_id}" if args.course_id else "all courses"
+        print(f"Rebuilding activity rollup for {scope}...")
+        AnalyticsService.rebuild_activity_rollup(db, args.course_id)
+        print("Activity rollup rebuilt.")
+    finally:
+        db.close()
@@ -0,0 +1,199 @@
+import sys
+import os
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import event
+from app.core.database import engine, SessionLocal
+from app.models import postgresql as models
+from app.services.analytics_service import AnalyticsService
+
+class QueryCounter:
+    """Counts statements sent to PostgreSQL while active."""
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+# --- Previous implementations (one query per assignment), kept for comparison ---
+
+def legacy_assignment_analytics(db, course_id: int):
+    assignments = db.query(models.Assignment).filter_by(course_id=course_id).all()
+    enrolled_count = db.query(models.CourseEnrollment).filter_by(course_id=course_id).count()
+
+    if not assignments:
+        return {}
+
+    total_submissions = 0
+    late_submissions = 0
+    missing_submissions = 0
+    grades_dist = {"A": 0, "B": 0, "C": 0, "D": 0, "F": 0}
+
+    for assignment in assignments:
+        submissions = db.query(models.Submission).filter_by(assignment_id=assignment.id).all()
+        submitted_user_ids = {sub.student_id for sub in submissions}
+        total_submissions += len(submissions)
+        missing_submissions += max(0, enrolled_count - len(submitted_user_ids))
+
+        for sub in submissions:
+            if sub.timestamp and assignment.due_date and sub.timestamp > assignment.due_date:
+                late_submissions += 1
+            if sub.grade is not None:
+                g = sub.grade
+                if g >= 90: grades_dist["A"] += 1
+                elif g >= 80: grades_dist["B"] += 1
+                elif g >= 70: grades_dist["C"] += 1
+                elif g >= 60: grades_dist["D"] += 1
+                else: grades_dist["F"] += 1
+
+    return {
+        "status_breakdown": {
+            "submitted": total_submissions - late_submissions,
+            "late": late_submissions,
+            "missing": missing_submissions
+        },
+        "grades_distribution": grades_dist
+    }
+
+def legacy_assignment_difficulty(db, course_id: int):
+    assignments = db.query(models.Assignment).filter_by(course_id=course_id).all()
+    data = []
+    for a in assignments:
+        subs = db.query(models.Submission).filter_by(assignment_id=a.id).all()
+        valid_grades = [s.grade for s in subs if s.grade is not None]
+        avg_grade = sum(valid_grades) / len(valid_grades) if valid_grades else 0
+        data.append({
+            "title": a.title,
+            "submission_count": len(subs),
+            "avg_grade": round(avg_grade, 2)
+        })
+    return data
+
+def sequential_full_dashboard(service, course_id: int):
+    # Sections one after another on one session, each recounting what it needs
+    return {
+        "kpis": service.get_quick_kpis(course_id),
+        "engagement_timeline": service.get_engagement_timeline(course_id),
+        "assignment_stats": service.get_assignment_analytics(course_id),
+        "difficulty_indicators": service.get_assignment_difficulty(course_id),
+        "course_completion": service.get_course_completion(course_id)
+    }
+
+# --- Seeding ---
+
+def seed_course(db, n_assignments: int, n_students: int, submit_ratio: float):
+    tag = uuid.uuid4().hex[:8]
+    teacher = models.User(name="Bench Teacher", email=f"bench-teacher-{tag}@example.com", hashed_password="x", role="teacher")
+    db.add(teacher)
+    db.flush()
+
+    course = models.Course(title=f"Benchmark {tag}", code=f"B{tag[:6].upper()}", teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+
+    db.bulk_insert_mappings(models.User, [
+        {"name": f"Student {i}", "email": f"bench-{tag}-{i}@example.com", "hashed_password": "x", "role": "student"}
+        for i in range(n_students)
+    ])
+    student_ids = [u.id for u in db.query(models.User.id).filter(models.User.email.like(f"bench-{tag}-%"))]
+    db.bulk_insert_mappings(models.CourseEnrollment, [
+        {"course_id": course.id, "user_id": sid} for sid in student_ids
+    ])
+
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(models.Assignment, [
+        {"course_id": course.id, "title": f"Assignment {i}", "due_date": now - timedelta(days=n_assignments - i), "max_points": 100}
+        for i in range(n_assignments)
+    ])
+    assignments = db.query(models.Assignment.id, models.Assignment.due_date).filter_by(course_id=course.id).all()
+
+    rng = random.Random(tag)
+    submissions = []
+    for a in assignments:
+        for sid in student_ids:
+            if rng.random() > submit_ratio:
+                continue
+            submissions.append({
+                "assignment_id": a.id,
+                "student_id": sid,
+                "timestamp": a.due_date + timedelta(hours=rng.randint(-72, 24)),
+                "grade": rng.randint(30, 100) if rng.random() < 0.8 else None
+            })
+    db.bulk_insert_mappings(models.Submission, submissions)
+    db.commit()
+
+    # Fresh statistics so the planner sees the seeded volume
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    return course.id, teacher.id, student_ids
+
+def cleanup(db, course_id: int, teacher_id: int, student_ids):
+    db.query(models.Course).filter(models.Course.id == course_id).delete()
+    db.query(models.User).filter(models.User.id.in_(student_ids + [teacher_id])).delete(synchronize_session=False)
+    db.commit()
+
+def measure(label: str, fn, repeat: int):
+    timings = []
+    with QueryCounter() as counter:
+        result = fn()
+    queries = counter.count
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{label:<12} queries={queries:<6} median={timings[len(timings) // 2]:.1f}ms  min={timings[0]:.1f}ms")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark course analytics queries against a seeded course.")
+    parser.add_argument("--assignments", type=int, default=200)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--submit-ratio", type=float, default=0.85)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded course instead of deleting it")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"Seeding course with {args.assignments} assignments and {args.students} students...")
+        course_id, teacher_id, student_ids = seed_course(db, args.assignments, args.students, args.submit_ratio)
+        service = AnalyticsService(db)
+
+        print("\nget_assignment_analytics")
+        before = measure("before", lambda: legacy_assignment_analytics(db, course_id), args.repeat)
+        after = measure("after", lambda: service.get_assignment_analytics(course_id), args.repeat)
+        assert before["status_breakdown"] == after["status_breakdown"]
+        assert before["grades_distribution"] == after["grades_distribution"]
+
+        print("\nget_assignment_difficulty")
+        before = measure("before", lambda: legacy_assignment_difficulty(db, course_id), args.repeat)
+        after = measure("after", lambda: service.get_assignment_difficulty(course_id), args.repeat)
+        assert sorted((d["title"], d["submission_count"], d["avg_grade"]) for d in before) == \
+            sorted((d["title"], d["submission_count"], d["avg_grade"]) for d in after)
+
+        print("\nget_full_dashboard")
+        before = measure("sequential", lambda: sequential_full_dashboard(service, course_id), args.repeat)
+        after = measure("concurrent", lambda: service.get_full_dashboard(course_id), args.repeat)
+        assert before == after
+
+        if not args.keep:
+            cleanup(db, course_id, teacher_id, student_ids)
+    finally:
+        db.close()
@@ -0,0 +1,66 @@
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.core import auth
+from app.core.config import settings
+
+async def measure_pool(hashed: str, password: str, requests: int):
+    # Warm the pool so process start-up is not counted
+    await asyncio.gather(*(asyncio.to_thread(auth.verify_password_pooled, password, hashed) for _ in range(settings.PASSWORD_HASH_WORKERS)))
+    start = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(auth.verify_password_pooled, password, hashed) for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+async def measure_server(url: str, email: str, password: str, requests: int, concurrency: int):
+    import httpx
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def login(client):
+        nonlocal failures
+        async with semaphore:
+            response = await client.post(f"{url}/api/v1/auth/login", data={"username": email, "password": password})
+            if response.status_code != 200:
+                failures += 1
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(login(client) for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure password verification (login) throughput.")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Pool sizes to compare (default: 1 and every CPU)")
+    parser.add_argument("--url", default=None, help="Load test a running server instead, e.g. http://localhost:8000")
+    parser.add_argument("--email", default=None, help="Existing account used with --url")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent logins with --url")
+    args = parser.parse_args()
+
+    print(f"bcrypt cost: {settings.BCRYPT_ROUNDS}, CPUs: {os.cpu_count()}")
+
+    if args.url:
+        if not args.email:
+            parser.error("--email is required with --url")
+        rate, failures = asyncio.run(measure_server(args.url, args.email, args.password, args.requests, args.concurrency))
+        print(f"{args.url}: {rate:.1f} logins/s ({failures} failed)")
+    else:
+        hashed = auth.get_password_hash(args.password)
+        start = time.perf_counter()
+        auth.verify_password(args.password, hashed)
+        print(f"single verification: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        for workers in args.workers or sorted({1, os.cpu_count()}):
+            settings.PASSWORD_HASH_WORKERS = workers
+            auth.shutdown_password_pool()
+            rate = asyncio.run(measure_pool(hashed, args.password, args.requests))
+            print(f"{workers} worker(s): {rate:.1f} verifications/s")
+        auth.shutdown_password_pool()
@@ -44,6 +44,7 @@ def clear_cassandra():
         cassandra_client.create_keyspace()
         cassandra_client.session.set_keyspace(settings.CASSANDRA_KEYSPACE)
         cassandra_client.create_tables()
+        cassandra_client.prepare_statements()
         print("Cassandra cleared and keyspace recreated.")
     except Exception as e:
         print(f"Error clearing Cassandra: {e}")
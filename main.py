@@ -1,14 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.core.database import engine
 from app.models.postgresql import Base
-from app.core import cassandra_db
+from app.core import cassandra_db, auth as core_auth
 from app.core.minio_client import init_minio
-from app.api.v1.endpoints import auth, courses, stream, assignments, analytics, pages, notifications, users
+from app.services.notification_queue import NotificationWorker
+from app.services.notification_push import notification_broker
+from app.services.event_logger import event_logger
+from app.api.v1.endpoints import auth, courses, stream, assignments, analytics, pages, notifications, users, uploads
 import uvicorn
+import threading
 
 # Create PostgreSQL tables
 Base.metadata.create_all(bind=engine)
@@ -26,13 +31,33 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"Error initializing MinIO: {e}")
     
+    notification_worker = None
+    if settings.NOTIFICATION_QUEUE_MODE == "redis" and settings.NOTIFICATION_WORKER_EMBEDDED:
+        notification_worker = NotificationWorker()
+        threading.Thread(target=notification_worker.run, name="notification-worker", daemon=True).start()
+    
+    event_logger.start()
+    
     yield
     
     # Shutdown logic
+    await event_logger.stop()
+    if notification_worker:
+        notification_worker.stop()
+    await notification_broker.close()
     cassandra_db.cassandra_client.close()
+    core_auth.shutdown_password_pool()
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # Reject oversized uploads from the Content-Length header, before the body is spooled
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.UPLOAD_MAX_REQUEST_MB * 1024 * 1024:
+        return JSONResponse(status_code=413, content={"detail": "Request body too large"})
+    return await call_next(request)
+
 # Include Routers
 app.include_router(pages.router, tags=["pages"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -42,6 +67,7 @@ app.include_router(assignments.router, prefix="/api/v1/assignments", tags=["assi
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["analytics"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["notifications"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
+app.include_router(uploads.router, prefix="/api/v1/uploads", tags=["uploads"])
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
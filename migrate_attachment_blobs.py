@@ -0,0 +1,46 @@
+import sys
+import os
+import argparse
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import text
+from app.core.database import engine, SessionLocal
+from app.core.minio_client import minio_client
+from app.core.config import settings
+from app.services.upload_service import UploadService, BLOB_PREFIX
+
+ATTACHMENT_TABLES = ["post_attachments", "assignment_attachments", "submission_attachments"]
+
+def add_columns():
+    with engine.connect() as conn:
+        for table in ATTACHMENT_TABLES:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_content_hash ON {table} (content_hash)"))
+            # Blob URLs are resolved to their row when served
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_file_url ON {table} (file_url)"))
+        conn.commit()
+    print(f"content_hash columns and indexes ready on {', '.join(ATTACHMENT_TABLES)}.")
+
+def collect_garbage(batch_size: int):
+    """Removes blobs no attachment references, e.g. after courses were deleted with their attachments."""
+    db = SessionLocal()
+    try:
+        for bucket in [settings.MINIO_BUCKET_ATTACHMENTS, settings.MINIO_BUCKET_SUBMISSIONS]:
+            hashes = [obj.object_name[len(BLOB_PREFIX):] for obj in minio_client.list_objects(bucket, prefix=BLOB_PREFIX)]
+            for i in range(0, len(hashes), batch_size):
+                UploadService.release_blobs(db, bucket, hashes[i:i + batch_size])
+            print(f"Checked {len(hashes)} blobs in {bucket}.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add content_hash to the attachment tables for deduplicated blob storage.")
+    parser.add_argument("--gc", action="store_true", help="Also remove blobs that no attachment references")
+    parser.add_argument("--batch-size", type=int, default=500, help="Blobs checked per transaction with --gc")
+    args = parser.parse_args()
+
+    add_columns()
+    if args.gc:
+        collect_garbage(args.batch_size)
@@ -0,0 +1,45 @@
+import sys
+import os
+import argparse
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent_with_args
+from app.core.cassandra_db import get_cassandra_session, get_statement, cassandra_client
+from app.services.event_logger import event_day
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the legacy event_logs table (partitioned by course) into the day-bucketed event_logs_by_day.")
+    parser.add_argument("--course-id", type=int, default=None, help="Only migrate this course (default: all courses)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows fetched and written per batch")
+    args = parser.parse_args()
+
+    session = get_cassandra_session()
+    statement = get_statement("insert_event")
+    query = "SELECT course_id, event_time, event_id, event_type, user_id, details FROM event_logs"
+    params = None
+    if args.course_id:
+        query += " WHERE course_id = %s"
+        params = (args.course_id,)
+    rows = session.execute(SimpleStatement(query, fetch_size=args.page_size), params)
+
+    copied = 0
+    try:
+        while True:
+            batch = [
+                (row.course_id, event_day(row.event_time), row.event_time, row.event_id,
+                 row.event_type, row.user_id, row.details)
+                for row in rows.current_rows
+            ]
+            # Inserts are idempotent, so an interrupted run can simply be restarted
+            execute_concurrent_with_args(session, statement, batch, concurrency=50)
+            copied += len(batch)
+            print(f"Copied {copied} events...")
+            if not rows.has_more_pages:
+                break
+            rows.fetch_next_page()
+        print("Event logs migrated. The legacy event_logs table is no longer written and can be dropped.")
+    finally:
+        cassandra_client.close()
@@ -0,0 +1,41 @@
+import sys
+import os
+import argparse
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from cassandra.query import SimpleStatement
+from cassandra.concurrent import execute_concurrent_with_args
+from app.core.cassandra_db import get_cassandra_session, get_statement, cassandra_client
+from app.services.notification_service import history_month
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the legacy notification_history table into the month-bucketed notification_history_by_month.")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows fetched and written per batch")
+    args = parser.parse_args()
+
+    session = get_cassandra_session()
+    statement = get_statement("insert_notification_history")
+    rows = session.execute(SimpleStatement(
+        "SELECT user_id, notification_id, type, reference_id, message, is_read, created_at FROM notification_history",
+        fetch_size=args.page_size
+    ))
+
+    copied = 0
+    try:
+        while True:
+            params = [
+                (row.user_id, history_month(row.created_at), row.created_at, row.notification_id,
+                 row.type, row.reference_id, row.message, row.is_read)
+                for row in rows.current_rows
+            ]
+            execute_concurrent_with_args(session, statement, params, concurrency=50)
+            copied += len(params)
+            print(f"Copied {copied} rows...")
+            if not rows.has_more_pages:
+                break
+            rows.fetch_next_page()
+        print("Notification history migrated. The legacy notification_history table is no longer written and can be dropped.")
+    finally:
+        cassandra_client.close()
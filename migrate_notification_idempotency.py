@@ -0,0 +1,18 @@
+import sys
+import os
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from sqlalchemy import text
+from app.core.database import engine
+
+if __name__ == "__main__":
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR"))
+        # Same columns as the model's unique_notification_per_job; existing rows have NULL keys, which never conflict
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS unique_notification_per_job ON notifications (idempotency_key, user_id)"
+        ))
+        conn.commit()
+    print("notifications.idempotency_key ready.")
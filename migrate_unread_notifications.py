@@ -0,0 +1,52 @@
+import sys
+import os
+import argparse
+import json
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.core.redis_db import redis_client
+from app.core.database import SessionLocal
+from app.core.config import settings
+from app.models import postgresql as models
+from app.services.notification_service import NotificationService, ADD_UNREAD
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move the legacy per-user unread notification lists into the sorted set/hash layout.")
+    parser.add_argument("--scan-count", type=int, default=1000, help="Keys examined per SCAN call")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    migrated_users = 0
+    migrated = 0
+    try:
+        for key in redis_client.scan_iter(match="user:*:notifications", count=args.scan_count):
+            if redis_client.type(key) != "list":
+                continue
+            user_id = int(key.split(":")[1])
+            payloads = {}
+            for raw in redis_client.lrange(key, 0, -1):
+                try:
+                    notif = json.loads(raw)
+                    payloads[int(notif["id"])] = raw
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+            # The list may hold entries read since; PostgreSQL has the authoritative state
+            unread = {row.id for row in db.query(models.Notification.id).filter(
+                models.Notification.user_id == user_id,
+                models.Notification.id.in_(list(payloads)),
+                models.Notification.is_read == False
+            )} if payloads else set()
+
+            # ADD_UNREAD is idempotent and keeps the newest entries, so this is safe alongside live writes and re-runs
+            keys = NotificationService._unread_keys(user_id)
+            for notification_id in sorted(unread):
+                ADD_UNREAD(keys=keys, args=[settings.NOTIFICATION_UNREAD_CACHE_SIZE, notification_id, payloads[notification_id]])
+            redis_client.delete(key)
+            migrated_users += 1
+            migrated += len(unread)
+        print(f"Migrated {migrated} unread notifications for {migrated_users} users.")
+    finally:
+        db.close()
@@ -0,0 +1,24 @@
+import sys
+import os
+import argparse
+import signal
+
+# Add the project root to sys.path to import app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from app.services.notification_queue import NotificationWorker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consume notification fan-out jobs from the Redis Stream.")
+    parser.add_argument("--name", default=None, help="Consumer name (default: host-pid-random)")
+    parser.add_argument("--batch-size", type=int, default=10)
+    args = parser.parse_args()
+
+    worker = NotificationWorker(consumer_name=args.name, batch_size=args.batch_size)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    print(f"Notification worker {worker.consumer_name} started.")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    print("Notification worker stopped.")